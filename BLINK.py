@@ -4,29 +4,118 @@
 
 import sys
 import os
+import importlib.util
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime, timedelta
+import argparse
+import csv
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
 import io
-import base64
 import random
+import tempfile
+import shutil
+import threading
+import queue
+import atexit
+from concurrent.futures import Future
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from itertools import islice
 
-DB_PATH = "blink_data.db"
+# pandas, numpy and matplotlib are imported inside the functions that use them,
+# so importing this module and the CLI/fallback paths only pay for sqlite3
+# (plus numpy for the fallback summary's target attainment, never pandas).
+
+# --- Streamlit: only when this file runs under `streamlit run` ---
+# `streamlit run` imports streamlit before executing the script; plain
+# `python BLINK.py` and other importers skip the (slow) import entirely.
+if 'streamlit' in sys.modules:
+    import streamlit as st
+    STREAMLIT_IMPORTED = True
+else:
+    st = None
+    STREAMLIT_IMPORTED = False
+
+# Default database; override with the BLINK_DB_PATH environment variable, or per
+# thread/task with use_database(). Nothing is opened until the first query.
+DB_PATH = os.environ.get("BLINK_DB_PATH", "blink_data.db")
+_current_db = ContextVar("blink_db_path", default=None)
 
 # --- Database helpers ---
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+@dataclass(frozen=True)
+class DBSettings:
+    """Per-connection SQLite tuning applied by get_conn."""
+    journal_mode: str = "wal"          # readers never block the writer (and vice versa)
+    synchronous: str = "NORMAL"        # safe with WAL; fsync at checkpoints only
+    write_synchronous: str = "FULL"    # the pool's writer: fsync the WAL on every commit
+    busy_timeout_ms: int = 5000        # wait for locks instead of "database is locked"
+    cache_size_kib: int = 16384        # page cache per connection
+    mmap_size: int = 128 * 1024 * 1024  # bytes of the file mapped for reads
+
+
+DB_SETTINGS = DBSettings()
+
+
+def get_conn(path=None, settings=None):
+    settings = settings or DB_SETTINGS
+    conn = sqlite3.connect(path or DB_PATH, timeout=settings.busy_timeout_ms / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA journal_mode={settings.journal_mode}")
+    conn.execute(f"PRAGMA synchronous={settings.synchronous}")
+    conn.execute(f"PRAGMA busy_timeout={int(settings.busy_timeout_ms)}")
+    conn.execute(f"PRAGMA cache_size={-int(settings.cache_size_kib)}")
+    conn.execute(f"PRAGMA mmap_size={int(settings.mmap_size)}")
     return conn
 
 
-def init_db(conn=None):
-    if conn is None:
-        conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+# SQL expressions for the UTC day number (days since 1970-01-01) and Unix epoch
+# milliseconds of an ISO timestamp; _ts_fields is the Python equivalent
+_DAY_SQL = "CAST(julianday({ts}) - 2440587.5 AS INTEGER)"
+_EPOCH_MS_SQL = "CAST(ROUND((julianday({ts}) - 2440587.5) * 86400000.0) AS INTEGER)"
+# next value of a table's modification sequence (mod_seq); evaluated inside the
+# write transaction, so sequence order is commit order
+_NEXT_SEQ_SQL = "(SELECT COALESCE(MAX(mod_seq), 0) + 1 FROM {table})"
+
+
+def _migrate_4_backfill_streaks(conn):
+    """Step-4 backfill of habit_streaks from daily_counts.
+
+    Frozen with the migration: it must keep producing the version-4 result, so
+    it does not call rebuild_streaks or any other helper that may change later.
+    """
+    def runs(days):
+        current = best = 0
+        prev = None
+        for d in days:
+            current = current + 1 if prev is not None and d == prev + 1 else 1
+            best = max(best, current)
+            prev = d
+        return current, best
+
+    by_habit = {}
+    for habit_id, day in conn.execute("SELECT habit_id, day FROM daily_counts ORDER BY habit_id, day"):
+        by_habit.setdefault(habit_id, []).append(day)
+    everyday = [r[0] for r in conn.execute("SELECT DISTINCT day FROM daily_counts ORDER BY day")]
+    if everyday:
+        by_habit[0] = everyday  # habit_id 0 = any habit
+    conn.executemany(
+        "INSERT OR REPLACE INTO habit_streaks (habit_id, current, best, last_day) VALUES (?,?,?,?)",
+        [(habit_id, *runs(days), days[-1]) for habit_id, days in by_habit.items()],
+    )
+
+# Schema migrations, applied in order. The position in the list (1-based) is the
+# schema version stored in ``PRAGMA user_version``; never edit or reorder an
+# entry that has shipped, append a new one instead. A step is a list of SQL
+# statements or callables taking the connection (for Python-side backfills).
+MIGRATIONS = [
+    # 1: base tables (IF NOT EXISTS so pre-versioning databases adopt cleanly)
+    [
         """
         CREATE TABLE IF NOT EXISTS habits (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,9 +125,7 @@ def init_db(conn=None):
             color TEXT DEFAULT '#7c3aed',
             created_at TEXT
         )
-        """
-    )
-    cur.execute(
+        """,
         """
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -47,87 +134,1750 @@ def init_db(conn=None):
             note TEXT,
             FOREIGN KEY(habit_id) REFERENCES habits(id)
         )
+        """,
+    ],
+    # 2: indexes for per-habit history and time-ordered reads
+    [
+        "CREATE INDEX IF NOT EXISTS idx_logs_habit_ts ON logs(habit_id, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(ts)",
+    ],
+    # 3: per-habit daily rollup kept current by triggers; day = days since 1970-01-01 (UTC)
+    [
         """
-    )
-    conn.commit()
+        CREATE TABLE daily_counts (
+            habit_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (habit_id, day)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_daily_counts_day ON daily_counts(day)",
+        f"""
+        INSERT INTO daily_counts (habit_id, day, count)
+        SELECT habit_id, {_DAY_SQL.format(ts='ts')}, COUNT(*) FROM logs
+        WHERE habit_id IS NOT NULL AND julianday(ts) IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_daily_insert AFTER INSERT ON logs
+        WHEN NEW.habit_id IS NOT NULL AND julianday(NEW.ts) IS NOT NULL
+        BEGIN
+            INSERT INTO daily_counts (habit_id, day, count)
+            VALUES (NEW.habit_id, {_DAY_SQL.format(ts='NEW.ts')}, 1)
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + 1;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_daily_delete AFTER DELETE ON logs
+        WHEN OLD.habit_id IS NOT NULL AND julianday(OLD.ts) IS NOT NULL
+        BEGIN
+            UPDATE daily_counts SET count = count - 1
+            WHERE habit_id = OLD.habit_id AND day = {_DAY_SQL.format(ts='OLD.ts')};
+            DELETE FROM daily_counts WHERE count <= 0;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_daily_update AFTER UPDATE OF habit_id, ts ON logs
+        BEGIN
+            UPDATE daily_counts SET count = count - 1
+            WHERE habit_id = OLD.habit_id AND day = {_DAY_SQL.format(ts='OLD.ts')};
+            DELETE FROM daily_counts WHERE count <= 0;
+            INSERT INTO daily_counts (habit_id, day, count)
+            SELECT NEW.habit_id, {_DAY_SQL.format(ts='NEW.ts')}, 1
+            WHERE NEW.habit_id IS NOT NULL AND julianday(NEW.ts) IS NOT NULL
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + 1;
+        END
+        """,
+    ],
+    # 4: materialized streaks per habit (habit_id 0 = any habit), see advance_streaks
+    [
+        """
+        CREATE TABLE habit_streaks (
+            habit_id INTEGER PRIMARY KEY,
+            current INTEGER NOT NULL DEFAULT 0,
+            best INTEGER NOT NULL DEFAULT 0,
+            last_day INTEGER
+        )
+        """,
+        _migrate_4_backfill_streaks,
+    ],
+    # 5: integer ts_epoch_ms / day columns so reads never parse ISO text; the
+    # rollup triggers now key on logs.day
+    [
+        "ALTER TABLE logs ADD COLUMN ts_epoch_ms INTEGER",
+        "ALTER TABLE logs ADD COLUMN day INTEGER",
+        f"UPDATE logs SET ts_epoch_ms = {_EPOCH_MS_SQL.format(ts='ts')}, day = {_DAY_SQL.format(ts='ts')} WHERE julianday(ts) IS NOT NULL",
+        "DROP INDEX IF EXISTS idx_logs_habit_ts",
+        "DROP INDEX IF EXISTS idx_logs_ts",
+        "CREATE INDEX idx_logs_habit_epoch ON logs(habit_id, ts_epoch_ms)",
+        "CREATE INDEX idx_logs_epoch ON logs(ts_epoch_ms)",
+        "DROP TRIGGER trg_logs_daily_insert",
+        "DROP TRIGGER trg_logs_daily_delete",
+        "DROP TRIGGER trg_logs_daily_update",
+        # writers that only set ts (older tools, sqlite3 shell) get the columns filled in
+        f"""
+        CREATE TRIGGER trg_logs_fill_epoch_insert AFTER INSERT ON logs
+        WHEN NEW.day IS NULL AND julianday(NEW.ts) IS NOT NULL
+        BEGIN
+            UPDATE logs SET ts_epoch_ms = {_EPOCH_MS_SQL.format(ts='NEW.ts')}, day = {_DAY_SQL.format(ts='NEW.ts')}
+            WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_fill_epoch_update AFTER UPDATE OF ts ON logs
+        WHEN julianday(NEW.ts) IS NOT NULL
+        BEGIN
+            UPDATE logs SET ts_epoch_ms = {_EPOCH_MS_SQL.format(ts='NEW.ts')}, day = {_DAY_SQL.format(ts='NEW.ts')}
+            WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_insert AFTER INSERT ON logs
+        WHEN NEW.habit_id IS NOT NULL AND NEW.day IS NOT NULL
+        BEGIN
+            INSERT INTO daily_counts (habit_id, day, count) VALUES (NEW.habit_id, NEW.day, 1)
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_delete AFTER DELETE ON logs
+        WHEN OLD.habit_id IS NOT NULL AND OLD.day IS NOT NULL
+        BEGIN
+            UPDATE daily_counts SET count = count - 1 WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_update AFTER UPDATE OF habit_id, day ON logs
+        BEGIN
+            UPDATE daily_counts SET count = count - 1 WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE count <= 0;
+            INSERT INTO daily_counts (habit_id, day, count)
+            SELECT NEW.habit_id, NEW.day, 1 WHERE NEW.habit_id IS NOT NULL AND NEW.day IS NOT NULL
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + 1;
+        END
+        """,
+    ],
+    # 6: optional idempotency key carried over from the source of an import
+    [
+        "ALTER TABLE logs ADD COLUMN import_key TEXT",
+        "CREATE UNIQUE INDEX idx_logs_import_key ON logs(import_key) WHERE import_key IS NOT NULL",
+    ],
+    # 7: modification sequence per table for incremental exports (export_changes).
+    # The app's own INSERTs set mod_seq directly; the triggers cover other
+    # writers and updates that leave mod_seq alone.
+    [
+        "ALTER TABLE habits ADD COLUMN mod_seq INTEGER",
+        "ALTER TABLE logs ADD COLUMN mod_seq INTEGER",
+        "UPDATE habits SET mod_seq = id",
+        "UPDATE logs SET mod_seq = id",
+        "CREATE INDEX idx_habits_mod_seq ON habits(mod_seq)",
+        "CREATE INDEX idx_logs_mod_seq ON logs(mod_seq)",
+        f"""
+        CREATE TRIGGER trg_habits_seq_insert AFTER INSERT ON habits
+        WHEN NEW.mod_seq IS NULL
+        BEGIN
+            UPDATE habits SET mod_seq = {_NEXT_SEQ_SQL.format(table='habits')} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_habits_seq_update AFTER UPDATE ON habits
+        WHEN NEW.mod_seq IS OLD.mod_seq
+        BEGIN
+            UPDATE habits SET mod_seq = {_NEXT_SEQ_SQL.format(table='habits')} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_seq_insert AFTER INSERT ON logs
+        WHEN NEW.mod_seq IS NULL
+        BEGIN
+            UPDATE logs SET mod_seq = {_NEXT_SEQ_SQL.format(table='logs')} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_logs_seq_update AFTER UPDATE ON logs
+        WHEN NEW.mod_seq IS OLD.mod_seq
+        BEGIN
+            UPDATE logs SET mod_seq = {_NEXT_SEQ_SQL.format(table='logs')} WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TABLE sync_cursors (
+            name TEXT PRIMARY KEY,
+            habits_seq INTEGER NOT NULL DEFAULT 0,
+            logs_seq INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+        """,
+    ],
+    # 8: a log row can stand for several completions (count); the rollup
+    # triggers move counts instead of rows
+    [
+        "ALTER TABLE logs ADD COLUMN count INTEGER NOT NULL DEFAULT 1",
+        "DROP TRIGGER trg_logs_daily_insert",
+        "DROP TRIGGER trg_logs_daily_delete",
+        "DROP TRIGGER trg_logs_daily_update",
+        """
+        CREATE TRIGGER trg_logs_daily_insert AFTER INSERT ON logs
+        WHEN NEW.habit_id IS NOT NULL AND NEW.day IS NOT NULL
+        BEGIN
+            INSERT INTO daily_counts (habit_id, day, count) VALUES (NEW.habit_id, NEW.day, NEW.count)
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + excluded.count;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_delete AFTER DELETE ON logs
+        WHEN OLD.habit_id IS NOT NULL AND OLD.day IS NOT NULL
+        BEGIN
+            UPDATE daily_counts SET count = count - OLD.count WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_update AFTER UPDATE OF habit_id, day, count ON logs
+        BEGIN
+            UPDATE daily_counts SET count = count - OLD.count WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE count <= 0;
+            INSERT INTO daily_counts (habit_id, day, count)
+            SELECT NEW.habit_id, NEW.day, NEW.count WHERE NEW.habit_id IS NOT NULL AND NEW.day IS NOT NULL
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + excluded.count;
+        END
+        """,
+    ],
+    # 9: drop emptied rollup rows by primary key; the bare `count <= 0` delete
+    # scanned all of daily_counts on every log update or delete
+    [
+        "DROP TRIGGER trg_logs_daily_delete",
+        "DROP TRIGGER trg_logs_daily_update",
+        """
+        CREATE TRIGGER trg_logs_daily_delete AFTER DELETE ON logs
+        WHEN OLD.habit_id IS NOT NULL AND OLD.day IS NOT NULL
+        BEGIN
+            UPDATE daily_counts SET count = count - OLD.count WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE habit_id = OLD.habit_id AND day = OLD.day AND count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_logs_daily_update AFTER UPDATE OF habit_id, day, count ON logs
+        BEGIN
+            UPDATE daily_counts SET count = count - OLD.count WHERE habit_id = OLD.habit_id AND day = OLD.day;
+            DELETE FROM daily_counts WHERE habit_id = OLD.habit_id AND day = OLD.day AND count <= 0;
+            INSERT INTO daily_counts (habit_id, day, count)
+            SELECT NEW.habit_id, NEW.day, NEW.count WHERE NEW.habit_id IS NOT NULL AND NEW.day IS NOT NULL
+            ON CONFLICT (habit_id, day) DO UPDATE SET count = count + excluded.count;
+        END
+        """,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION, one transaction per step."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"database schema v{version} is newer than this app (v{SCHEMA_VERSION})"
+        )
+    for step in range(version, SCHEMA_VERSION):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # another process may have migrated while we waited for the lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] > step:
+                conn.rollback()
+                continue
+            for stmt in MIGRATIONS[step]:
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    conn.execute(stmt)
+            conn.execute(f"PRAGMA user_version = {step + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
     return conn
 
-conn = init_db()
+
+def init_db(conn=None):
+    if conn is None:
+        conn = get_conn()
+    return migrate(conn)
+
+
+class ReadCache:
+    """Memoized query results, dropped whenever the database changes.
+
+    The version token pairs a counter bumped by this process's writes with
+    ``PRAGMA data_version`` on a dedicated connection, which changes when any
+    other connection or process commits. Until the token moves, repeated reads
+    are served from memory; results are shared, so treat them as read-only.
+    """
+
+    def __init__(self, path, settings, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._watch = get_conn(path, settings)
+        self._writes = 0
+        self._token = None
+        self._entries = OrderedDict()
+
+    def bump(self):
+        with self._lock:
+            self._writes += 1
+
+    def version(self):
+        with self._lock:
+            return self._writes, self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self, key, loader):
+        token = self.version()
+        with self._lock:
+            if token != self._token:
+                self._entries.clear()
+                self._token = token
+            elif key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = loader()
+        with self._lock:
+            # a write during loader() moved the token; don't cache a stale result
+            if token == self._token:
+                self._entries[key] = value
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def close(self):
+        with self._lock:
+            self._watch.close()
+            self._entries.clear()
+
+
+class ConnectionPool:
+    """Per-thread read connections plus one writer connection behind a lock.
+
+    SQLite in WAL mode lets readers run concurrently with the single writer, so
+    each thread gets its own query-only connection and all writes are
+    serialized through ``writer()``.
+    """
+
+    def __init__(self, path=None, settings=None):
+        self.path = path or DB_PATH
+        self.settings = settings or DB_SETTINGS
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._writer = init_db(get_conn(self.path, self.settings))
+        # a committed write (and a resolved LogWriter Future) must survive power loss
+        self._writer.execute(f"PRAGMA synchronous={self.settings.write_synchronous}")
+        self.cache = ReadCache(self.path, self.settings)
+
+    def reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = get_conn(self.path, self.settings)
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Yield the writer connection inside a transaction (commit or rollback)."""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            finally:
+                self.cache.bump()
+
+    def close(self):
+        self.cache.close()
+        with self._write_lock:
+            self._writer.close()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _freeze(value):
+    # cache keys must hash: lists, sets, iterators, numpy arrays, Series and
+    # other unhashable iterables become tuples of their items
+    if isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset, Iterator)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def cached_read(fn):
+    """Serve fn's result from the pool's ReadCache until the data version changes.
+
+    fn receives the frozen arguments, so one-shot iterators are read only once.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        args = _freeze(args)
+        kwargs = {k: _freeze(v) for k, v in kwargs.items()}
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        return get_pool().cache.get(key, lambda: fn(*args, **kwargs))
+    return wrapper
+
+
+def _process_singleton(factory):
+    # Streamlit re-executes this file on every rerun; cache_resource keeps one
+    # instance per process instead of one per rerun.
+    if STREAMLIT_IMPORTED:
+        return st.cache_resource(show_spinner=False)(factory)
+    return lru_cache(maxsize=None)(factory)
+
+
+@_process_singleton
+def _open_pool(path):
+    return ConnectionPool(path)
+
+
+def _resolve_db(path=None):
+    return os.path.abspath(path or _current_db.get() or DB_PATH)
+
+
+def get_pool(path=None):
+    """Pool for ``path``, else the use_database() path, else DB_PATH.
+
+    The database is opened (and migrated) on first use; each path gets one
+    pool per process.
+    """
+    return _open_pool(_resolve_db(path))
+
+
+@contextmanager
+def use_database(path):
+    """Point every helper called in this thread/task at ``path`` for the block.
+
+    Backed by a ContextVar, so threads or tasks can work on different
+    databases in parallel.
+    """
+    token = _current_db.set(path)
+    try:
+        yield get_pool(path)
+    finally:
+        _current_db.reset(token)
+
 
 # core helpers
 
+INSERT_HABIT_SQL = ("INSERT INTO habits (name, category, target, color, created_at, mod_seq)"
+                    f" VALUES (?,?,?,?,?,{_NEXT_SEQ_SQL.format(table='habits')})")
+
+
 def add_habit(name, category, target, color):
-    cur = conn.cursor()
-    cur.execute("INSERT INTO habits (name, category, target, color, created_at) VALUES (?,?,?,?,?)",
-                (name, category, int(target), color, datetime.utcnow().isoformat()))
-    conn.commit()
+    with get_pool().writer() as conn:
+        cur = conn.execute(INSERT_HABIT_SQL, (name, category, int(target), color, datetime.utcnow().isoformat()))
+    return cur.lastrowid
 
 
+@cached_read
 def get_habits():
-    return pd.read_sql_query("SELECT * FROM habits ORDER BY id DESC", conn)
+    import pandas as pd
+    return pd.read_sql_query("SELECT * FROM habits ORDER BY id DESC", get_pool().reader())
+
+
+@cached_read
+def get_habit_rows():
+    """(id, name, category, target) tuples, newest first, without pandas."""
+    return get_pool().reader().execute("SELECT id, name, category, target FROM habits ORDER BY id DESC").fetchall()
+
+
+class LogWriter:
+    """Background thread that group-commits queued log inserts.
+
+    The first queued insert opens a batch; anything queued within
+    ``max_latency_ms`` (up to ``max_batch`` rows) shares its transaction, so a
+    burst of clicks costs one commit (and one WAL fsync, see
+    DBSettings.write_synchronous) instead of one per click. ``submit``
+    returns a Future that resolves to the log id once the batch is durably
+    committed: the new row's, or with ``coalesce`` the same-day row the count
+    was added to.
+    """
+
+    def __init__(self, pool, max_latency_ms=2, max_batch=1000):
+        self.pool = pool
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="blink-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, habit_id, ts, note, count=1, coalesce=False):
+        future = Future()
+        self._queue.put((future, _log_row(habit_id, ts, note, count), coalesce))
+        return future
 
+    def close(self):
+        """Flush everything queued so far and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
 
-def add_log(habit_id, ts=None, note=None):
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_latency
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        try:
+            with self.pool.writer() as conn:
+                ids = [_write_log(conn, row, coalesce) for _, row, coalesce in batch]
+                advance_streaks(conn, [(row[0], row[3], row[5]) for _, row, _ in batch])
+        except Exception as exc:
+            for future, _, _ in batch:
+                future.set_exception(exc)
+            return
+        for (future, _, _), log_id in zip(batch, ids):
+            future.set_result(log_id)
+
+
+@_process_singleton
+def _open_log_writer(path):
+    return LogWriter(_open_pool(path))
+
+
+
+def add_log_async(habit_id, ts=None, note=None, count=1, coalesce=False):
+    """Queue ``count`` completions of a habit; the Future resolves to the log id once committed.
+
+    With ``coalesce`` a note-less entry is added to that habit's latest
+    note-less row of the same (UTC) day instead of inserting a new row.
+    """
+    count = int(count)
+    if count < 1:
+        raise ValueError(f"count must be at least 1, got {count}")
     if ts is None:
         ts = datetime.utcnow().isoformat()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO logs (habit_id, ts, note) VALUES (?,?,?)", (habit_id, ts, note))
-    conn.commit()
+    return _open_log_writer(_resolve_db()).submit(habit_id, ts, note, count, coalesce)
+
+
+def add_log(habit_id, ts=None, note=None, count=1, coalesce=False):
+    return add_log_async(habit_id, ts, note, count, coalesce).result()
+
+
+BULK_CHUNK_SIZE = 5000
+
+
+def _chunks(rows, size):
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bulk_report(rows, started):
+    seconds = time.perf_counter() - started
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds > 0 else float('inf')}
+
+
+def add_logs_bulk(rows, chunk_size=BULK_CHUNK_SIZE):
+    """Insert an iterable of (habit_id, ts, note) with one commit per chunk.
+
+    ``ts`` may be None (now), an ISO string or a datetime. Unknown habit ids
+    and unparseable timestamps raise ValueError before their chunk is written; earlier chunks stay
+    committed. Returns ``{'rows', 'seconds', 'rows_per_sec'}``.
+    """
+    started = time.perf_counter()
+    known = {r[0] for r in get_pool().reader().execute("SELECT id FROM habits")}
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        now = datetime.utcnow().isoformat()
+        batch = []
+        for habit_id, ts, note in chunk:
+            habit_id = int(habit_id)
+            if habit_id not in known:
+                raise ValueError(f"unknown habit id: {habit_id}")
+            batch.append(_log_row(habit_id, ts or now, note))
+        with get_pool().writer() as conn:
+            conn.executemany(INSERT_LOG_SQL, batch)
+            # one O(days) rebuild per touched habit beats a lookup per row
+            rebuild_streaks(conn, {row[0] for row in batch})
+        total += len(batch)
+    return _bulk_report(total, started)
+
+
+def add_habits_bulk(rows, chunk_size=BULK_CHUNK_SIZE):
+    """Insert an iterable of (name, category, target, color); same report as add_logs_bulk."""
+    started = time.perf_counter()
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        now = datetime.utcnow().isoformat()
+        batch = []
+        for name, category, target, color in chunk:
+            if not name or not str(name).strip():
+                raise ValueError("habit name is required")
+            batch.append((str(name).strip(), category, int(target or 1), color or '#7c3aed', now))
+        with get_pool().writer() as conn:
+            conn.executemany(INSERT_HABIT_SQL, batch)
+        total += len(batch)
+    return _bulk_report(total, started)
+
+
+# --- Import ---
+# Logs exported from other trackers, as CSV (with a header row) or JSON Lines.
+# A record names its habit by id or by name and carries an ISO timestamp; note,
+# import_key and count (default 1) are optional. Field names are matched case-insensitively
+# against the aliases below.
+
+IMPORT_CHUNK_SIZE = 20000
+IMPORT_FIELDS = (
+    ('habit_id', ('habit_id',)),
+    ('habit', ('habit', 'habit_name', 'name')),
+    ('ts', ('ts', 'timestamp', 'datetime', 'date')),
+    ('note', ('note', 'notes', 'comment')),
+    ('import_key', ('import_key', 'key')),
+    ('count', ('count', 'quantity', 'qty')),
+)
+IMPORT_LOG_SQL = ("INSERT INTO logs (habit_id, ts, ts_epoch_ms, day, note, import_key, count, mod_seq)"
+                  " VALUES (?,?,?,?,?,?,?,?)")
+
+
+def _import_frame(df):
+    """``df`` with its columns renamed to the IMPORT_FIELDS names (absent ones as None)."""
+    import pandas as pd
+    lowered = {}
+    for col in df.columns:
+        lowered.setdefault(str(col).strip().lower(), col)
+    columns = {}
+    for field, aliases in IMPORT_FIELDS:
+        col = next((lowered[a] for a in aliases if a in lowered), None)
+        if col is not None:
+            columns[field] = df[col]
+    if 'habit_id' not in columns and 'habit' not in columns:
+        raise ValueError("import needs a habit_id or habit column")
+    if 'ts' not in columns:
+        raise ValueError("import needs a ts column")
+    frame = pd.DataFrame(columns, index=df.index).reindex(columns=[f for f, _ in IMPORT_FIELDS]).astype(object)
+    # missing JSON keys and absent columns come through as NaN
+    return frame.where(frame.notna(), None)
+
+
+def _import_frames(fp, fmt, chunk_size):
+    """DataFrames of up to ``chunk_size`` records, as returned by _import_frame."""
+    import pandas as pd
+    if fmt == 'csv':
+        try:
+            reader = pd.read_csv(fp, chunksize=chunk_size, dtype=str, keep_default_na=False)
+        except pd.errors.EmptyDataError:
+            return
+        with reader:
+            for df in reader:
+                yield _import_frame(df)
+    else:
+        records = (json.loads(line) for line in fp if line.strip())
+        for chunk in _chunks(records, chunk_size):
+            yield _import_frame(pd.DataFrame(chunk, dtype=object))
+
+
+def _import_format(source, fmt):
+    if fmt:
+        return fmt
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return 'jsonl' if str(name).lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def _import_epoch_ms(ts, first):
+    """Epoch ms per ISO timestamp, vectorized; naive values are UTC like _ts_fields."""
+    import pandas as pd
+    text = ts.where(ts.map(type) == str)
+    parsed = pd.to_datetime(text, format='ISO8601', utc=True, errors='coerce')
+    bad = parsed.isna().to_numpy().nonzero()[0]
+    if len(bad):
+        raise ValueError(f"record {first + bad[0]}: invalid timestamp {ts.iloc[bad[0]]!r}")
+    us = (parsed - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(microseconds=1)
+    return (us.to_numpy() + 500) // 1000
+
+
+def _present(col):
+    # None, NaN and '' all mean "not given"
+    return (col.notna() & (col != '')).to_numpy()
+
+
+def _raise_at(mask, first, message):
+    # ValueError naming the first record flagged in ``mask``
+    bad = mask.nonzero()[0]
+    if len(bad):
+        raise ValueError(f"record {first + bad[0]}: {message(bad[0])}")
+
+
+def _import_int(col, first, field, default):
+    # optional integer field: absent values as ``default``; text, NaN and
+    # fractions raise instead of being coerced or truncated
+    import numpy as np
+    import pandas as pd
+    present = _present(col)
+    values = pd.to_numeric(col.where(present), errors='coerce').to_numpy(dtype=float)
+    bad = present & ~(np.isfinite(values) & (values == np.floor(values)))
+    _raise_at(bad, first, lambda i: f"invalid {field} {col.iloc[i]!r}")
+    return np.where(present, values, default).astype(np.int64)
+
+
+def _import_text(col):
+    # optional text field: absent values as None, anything else as str; kept
+    # as object dtype, since a str dtype would turn None into NaN
+    import pandas as pd
+    present = _present(col)
+    out = col.where(present, None).astype(object)
+    out[present] = out[present].astype(str)
+    return pd.Series(out.to_numpy(), dtype=object)
+
+
+def _existing_import_keys(conn, keys):
+    if not keys:
+        return set()
+    return {r[0] for r in conn.execute(
+        "SELECT import_key FROM logs WHERE import_key IN (SELECT value FROM json_each(?))", (json.dumps(keys),))}
+
+
+class _RecordKeys:
+    """import_key for records that carry none, derived from the source record.
+
+    The key is the record's epoch ms, a digest of its raw fields and its occurrence number
+    among identical records seen so far, so three identical lines become three
+    logs and importing the same file again matches all three. Occurrences are
+    counted across chunks in sorted numpy arrays (16 bytes per distinct record).
+    """
 
+    FIELDS = ('habit_id', 'habit', 'ts', 'note', 'count')
 
-def get_logs():
+    def __init__(self):
+        import numpy as np
+        self._digests = np.empty(0, dtype=np.uint64)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def _lookup(self, digests):
+        import numpy as np
+        pos = np.searchsorted(self._digests, digests)
+        hit = pos < self._digests.size
+        hit[hit] = self._digests[pos[hit]] == digests[hit]
+        return pos, hit
+
+    def keys(self, df, epoch_ms):
+        import numpy as np
+        import pandas as pd
+        text = [df[f].fillna('').astype(str) for f in self.FIELDS]
+        raw = text[0].str.cat(text[1:], sep='\x1f')
+        digests = np.array([int.from_bytes(hashlib.blake2b(r.encode(), digest_size=8).digest(), 'little')
+                            for r in raw.tolist()], dtype=np.uint64)
+        pos, hit = self._lookup(digests)
+        occurrence = pd.Series(digests).groupby(digests).cumcount().to_numpy(copy=True)
+        occurrence[hit] += self._counts[pos[hit]]
+        unique, counts = np.unique(digests, return_counts=True)
+        pos, hit = self._lookup(unique)
+        self._counts[pos[hit]] += counts[hit]
+        self._digests = np.insert(self._digests, pos[~hit], unique[~hit])
+        self._counts = np.insert(self._counts, pos[~hit], counts[~hit])
+        # leading with the timestamp keeps time-ordered sources appending to the
+        # import_key index instead of scattering random digests through it
+        return [f"rec:{ms:013d}:{d:016x}:{n}"
+                for ms, d, n in zip(epoch_ms.tolist(), digests.tolist(), occurrence.tolist())]
+
+
+def import_logs(source, fmt=None, chunk_size=IMPORT_CHUNK_SIZE, create_habits=True):
+    """Stream logs from a CSV/JSONL path or text file object into the database.
+
+    Records are parsed ``chunk_size`` at a time (timestamps vectorized in
+    pandas) and each chunk is one transaction. Habit names resolve through an
+    in-memory map; unknown names become new habits unless ``create_habits`` is
+    False, in which case they raise ValueError, as do unknown ids and
+    unparseable timestamps (earlier chunks stay committed).
+
+    A record is a duplicate only when its import_key is already stored (or
+    repeats earlier in the source). Records without one get a key derived
+    from their own fields (see _RecordKeys), so identical records all import
+    and re-running the same import adds nothing.
+    Returns add_logs_bulk's report plus ``inserted`` and ``skipped``.
+    """
+    fmt = _import_format(source, fmt)
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"unknown import format: {fmt}")
+    import numpy as np
+    import pandas as pd
+    started = time.perf_counter()
+    habit_ids = set()
+    names = {}
+    for hid, name in get_pool().reader().execute("SELECT id, name FROM habits ORDER BY id DESC"):
+        habit_ids.add(hid)
+        names[name] = hid  # lowest id wins for duplicate names
+    total = inserted = 0
+    record_keys = _RecordKeys()
+    fp = open(source, newline='', encoding='utf-8') if isinstance(source, str) else source
+    try:
+        for df in _import_frames(fp, fmt, chunk_size):
+            first = total + 1
+            total += len(df)
+            epoch_ms = _import_epoch_ms(df['ts'], first)
+            by_id = _present(df['habit_id'])
+            by_name = _present(df['habit']) & ~by_id
+            _raise_at(~(by_id | by_name), first, lambda i: "no habit")
+            ids = _import_int(df['habit_id'], first, 'habit id', 0)
+            _raise_at(by_id & ~np.isin(ids, list(habit_ids)), first, lambda i: f"unknown habit id {ids[i]}")
+            refs = df['habit'].astype(str).str.strip().to_numpy()
+            unknown = by_name & ~np.isin(refs, list(names))
+            if not create_habits:
+                _raise_at(unknown, first, lambda i: f"unknown habit {refs[i]!r}")
+            new_names = pd.unique(refs[unknown]).tolist()
+            import_keys = _import_text(df['import_key'])
+            missing = import_keys.isna().to_numpy()
+            if missing.any():
+                import_keys[missing] = record_keys.keys(df[missing], epoch_ms[missing])
+            counts = _import_int(df['count'], first, 'count', 1)
+            _raise_at(counts < 1, first, lambda i: f"count must be at least 1, got {counts[i]}")
+            with get_pool().writer() as conn:
+                now = datetime.utcnow().isoformat()
+                for ref in new_names:
+                    names[ref] = conn.execute(INSERT_HABIT_SQL, (ref, None, 1, '#7c3aed', now)).lastrowid
+                    habit_ids.add(names[ref])
+                resolved = ids.copy()
+                resolved[by_name] = pd.Series(refs[by_name]).map(names).to_numpy(dtype=np.int64)
+                rows = pd.DataFrame({
+                    'habit_id': resolved, 'ts': df['ts'].to_numpy(), 'ts_epoch_ms': epoch_ms,
+                    'day': epoch_ms // MS_PER_DAY, 'note': _import_text(df['note']),
+                    'import_key': import_keys.to_numpy(), 'count': counts,
+                })
+                # first occurrence of each key wins, within the chunk and against the table
+                rows = rows.drop_duplicates('import_key')
+                rows = rows[~rows['import_key'].isin(list(_existing_import_keys(conn, rows['import_key'].tolist())))]
+                if len(rows):
+                    # number the chunk in one go rather than a MAX(mod_seq) lookup per row
+                    seq = conn.execute(f"SELECT {_NEXT_SEQ_SQL.format(table='logs')}").fetchone()[0]
+                    conn.executemany(IMPORT_LOG_SQL, zip(*(rows[c].tolist() for c in rows.columns),
+                                                         range(seq, seq + len(rows))))
+                    rebuild_streaks(conn, set(rows['habit_id'].tolist()))
+                inserted += len(rows)
+    finally:
+        if fp is not source:
+            fp.close()
+    return {**_bulk_report(total, started), 'inserted': inserted, 'skipped': total - inserted}
+
+
+# --- Materialized streaks ---
+
+ALL_HABITS = 0  # habit_streaks row for "any habit logged that day"
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = EPOCH_UTC.toordinal()
+
+
+def _ts_fields(ts):
+    """(iso_text, epoch_ms, day) for a datetime or ISO string, parsed once at write time.
+
+    Naive values are taken as UTC. Unparseable text comes back as-is with NULL
+    epoch/day, mirroring julianday() returning NULL in SQL; _log_row rejects it.
+    """
+    if isinstance(ts, str):
+        try:
+            dt = datetime.fromisoformat(ts)
+        except ValueError:
+            return ts, None, None
+    else:
+        dt, ts = ts, ts.isoformat()
+    # integer maths, rounding half-up to the millisecond like julianday();
+    # spelled out field by field because this runs once per imported row
+    us = ((dt.toordinal() - EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second) * 1_000_000
+    us += dt.microsecond
+    offset = dt.utcoffset()
+    if offset:
+        us -= offset // timedelta(microseconds=1)
+    epoch_ms = (us + 500) // 1000
+    return ts, epoch_ms, epoch_ms // 86_400_000
+
+
+INSERT_LOG_SQL = ("INSERT INTO logs (habit_id, ts, ts_epoch_ms, day, note, count, mod_seq)"
+                  f" VALUES (?,?,?,?,?,?,{_NEXT_SEQ_SQL.format(table='logs')})")
+MS_PER_DAY = 86_400_000
+# the day bounds go through ts_epoch_ms so idx_logs_habit_epoch finds the row
+COALESCE_LOG_SQL = (
+    f"UPDATE logs SET count = count + ?, mod_seq = {_NEXT_SEQ_SQL.format(table='logs')}"
+    " WHERE id = (SELECT id FROM logs WHERE habit_id = ? AND ts_epoch_ms >= ? AND ts_epoch_ms < ?"
+    " AND note IS NULL ORDER BY ts_epoch_ms DESC, id DESC LIMIT 1) RETURNING id"
+)
+
+
+def _log_row(habit_id, ts, note, count=1):
+    ts, epoch_ms, day = _ts_fields(ts)
+    # a NULL epoch would drop the row from day rollups and keyset pages
+    if epoch_ms is None:
+        raise ValueError(f"invalid timestamp: {ts!r}")
+    return (int(habit_id), ts, epoch_ms, day, note or None, int(count))
+
+
+def _write_log(conn, row, coalesce=False):
+    """Insert a _log_row, or fold its count into the same-day row when coalescing."""
+    day, note, count = row[3], row[4], row[5]
+    if coalesce and note is None and day is not None:
+        hit = conn.execute(COALESCE_LOG_SQL, (count, row[0], day * MS_PER_DAY, (day + 1) * MS_PER_DAY)).fetchone()
+        if hit is not None:
+            return hit[0]
+    return conn.execute(INSERT_LOG_SQL, row).lastrowid
+
+
+def _store_streak(conn, habit_id, current, best, last_day):
+    conn.execute(
+        "INSERT OR REPLACE INTO habit_streaks (habit_id, current, best, last_day) VALUES (?,?,?,?)",
+        (habit_id, current, best, last_day),
+    )
+
+
+def advance_streaks(conn, habit_days):
+    """Fold newly logged (habit_id, day, count) entries into habit_streaks.
+
+    Must run in the same transaction as the inserts (after the daily_counts
+    triggers fired). Days at or after a habit's last_day cost O(1); a
+    back-dated day that is new for the habit triggers rebuild_streaks for it.
+    """
+    habit_days = [(h, d, n) for h, d, n in habit_days if d is not None]
+    # counts from this batch are already in daily_counts
+    pending = Counter()
+    for habit_id, day, n in habit_days:
+        pending[(habit_id, day)] += n
+        pending[(ALL_HABITS, day)] += n
+    stale = set()
+    for habit_id, day, _ in habit_days:
+        for key in (habit_id, ALL_HABITS):
+            if key in stale:
+                continue
+            row = conn.execute("SELECT current, best, last_day FROM habit_streaks WHERE habit_id=?", (key,)).fetchone()
+            if row is None or row[2] is None:
+                _store_streak(conn, key, 1, 1, day)
+                continue
+            current, best, last_day = row
+            if day == last_day:
+                continue
+            if day == last_day + 1:
+                current += 1
+                _store_streak(conn, key, current, max(best, current), day)
+            elif day > last_day:
+                _store_streak(conn, key, 1, max(best, 1), day)
+            else:
+                where = "day=?" if key == ALL_HABITS else "habit_id=? AND day=?"
+                params = (day,) if key == ALL_HABITS else (key, day)
+                if conn.execute(f"SELECT SUM(count) FROM daily_counts WHERE {where}", params).fetchone()[0] <= pending[(key, day)]:
+                    stale.add(key)
+    if stale:
+        rebuild_streaks(conn, stale - {ALL_HABITS}, overall=ALL_HABITS in stale)
+
+
+def rebuild_streaks(conn, habit_ids=None, overall=True):
+    """Recompute habit_streaks from daily_counts (all habits when habit_ids is None).
+
+    Use after back-dated inserts, bulk loads, or edits/deletes made outside the app.
+    """
+    if habit_ids is None:
+        conn.execute("DELETE FROM habit_streaks")
+        rows = conn.execute("SELECT habit_id, day FROM daily_counts ORDER BY habit_id, day").fetchall()
+    else:
+        habit_ids = sorted(int(h) for h in habit_ids)
+        if not habit_ids and not overall:
+            return
+        marks = ','.join('?' * len(habit_ids)) or 'NULL'
+        conn.execute(f"DELETE FROM habit_streaks WHERE habit_id IN ({marks})", habit_ids)
+        rows = conn.execute(f"SELECT habit_id, day FROM daily_counts WHERE habit_id IN ({marks}) ORDER BY habit_id, day",
+                            habit_ids).fetchall()
+    if rows:
+        import numpy as np
+        arr = np.array(rows, dtype=np.int64)
+        # the numpy core directly: CLI writes must not pull in pandas
+        per_habit = _group_runs(arr[:, 0], arr[:, 1])
+        conn.executemany(
+            "INSERT OR REPLACE INTO habit_streaks (habit_id, current, best, last_day) VALUES (?,?,?,?)",
+            zip(*(a.tolist() for a in per_habit)),
+        )
+    if overall:
+        days = [r[0] for r in conn.execute("SELECT DISTINCT day FROM daily_counts ORDER BY day")]
+        if days:
+            _store_streak(conn, ALL_HABITS, *streaks_from_days(days), days[-1])
+        else:
+            conn.execute("DELETE FROM habit_streaks WHERE habit_id=?", (ALL_HABITS,))
+
+
+@cached_read
+def get_habit_streaks():
+    """DataFrame of materialized (current, best) streaks indexed by habit_id."""
+    import pandas as pd
     return pd.read_sql_query(
-        "SELECT l.id, l.habit_id, l.ts, l.note, h.name as habit_name FROM logs l LEFT JOIN habits h ON h.id=l.habit_id ORDER BY ts DESC",
-        conn
+        "SELECT habit_id, current, best FROM habit_streaks WHERE habit_id != ?",
+        get_pool().reader(), params=(ALL_HABITS,), index_col='habit_id',
     )
 
+
+@cached_read
+def get_streak(habit_id=None):
+    """(current, best) from habit_streaks; habit_id None means any habit."""
+    row = get_pool().reader().execute(
+        "SELECT current, best FROM habit_streaks WHERE habit_id=?",
+        (ALL_HABITS if habit_id is None else int(habit_id),),
+    ).fetchone()
+    return tuple(row) if row else (0, 0)
+
+
+@cached_read
+def get_habit_stats():
+    """(id, name, category, target, total, current, best) per habit, from the rollups."""
+    return get_pool().reader().execute(
+        "SELECT h.id, h.name, h.category, h.target,"
+        " COALESCE((SELECT SUM(d.count) FROM daily_counts d WHERE d.habit_id = h.id), 0),"
+        " COALESCE(s.current, 0), COALESCE(s.best, 0)"
+        " FROM habits h LEFT JOIN habit_streaks s ON s.habit_id = h.id ORDER BY h.id"
+    ).fetchall()
+
+
+def _epoch_bound(value):
+    # since/until may be datetimes, dates or ISO strings; compare as epoch ms
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    epoch_ms = _ts_fields(value)[1]
+    # `ts_epoch_ms >= NULL` would silently match nothing
+    if epoch_ms is None:
+        raise ValueError(f"invalid timestamp: {value!r}")
+    return epoch_ms
+
+
+def _log_filters(since=None, until=None, habit_ids=None):
+    where, params = [], []
+    if since is not None:
+        where.append("l.ts_epoch_ms >= ?")
+        params.append(_epoch_bound(since))
+    if until is not None:
+        where.append("l.ts_epoch_ms < ?")
+        params.append(_epoch_bound(until))
+    if habit_ids is not None:
+        habit_ids = [int(h) for h in habit_ids]
+        where.append(f"l.habit_id IN ({','.join('?' * len(habit_ids)) or 'NULL'})")
+        params.extend(habit_ids)
+    return where, params
+
+
+LOGS_SELECT = "SELECT l.id, l.habit_id, l.ts, l.ts_epoch_ms, l.day, l.note, h.name as habit_name, l.count FROM logs l LEFT JOIN habits h ON h.id=l.habit_id"
+
+
+@cached_read
+def get_logs(since=None, until=None, habit_ids=None, limit=None):
+    """Logs newest first; ``since`` is inclusive, ``until`` exclusive.
+
+    Filters are pushed down to SQLite so callers only pay for the rows they show.
+    """
+    import pandas as pd
+    where, params = _log_filters(since, until, habit_ids)
+    sql = LOGS_SELECT
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY l.ts_epoch_ms DESC, l.id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return pd.read_sql_query(sql, get_pool().reader(), params=params)
+
+
+LOG_PAGE_SIZE = 50
+
+
+LOGS_COLUMNS = ['id', 'habit_id', 'ts', 'ts_epoch_ms', 'day', 'note', 'habit_name', 'count']
+
+
+@cached_read
+def get_logs_page_rows(cursor=None, page_size=LOG_PAGE_SIZE, habit_ids=None):
+    """One page of logs (newest first) using keyset pagination on (ts_epoch_ms, id).
+
+    ``cursor`` is the (ts_epoch_ms, id) of the last row of the previous page, or None for
+    the first page. Returns ``(rows, next_cursor)`` with rows as plain tuples
+    in LOGS_COLUMNS order; next_cursor is None on the last page.
+
+    Rows without ts_epoch_ms (legacy, unparseable ts) come last, newest id
+    first, like in get_logs; their cursors carry None as the epoch.
+    """
+    where, params = _log_filters(habit_ids=habit_ids)
+    # one extra row tells us whether another page exists
+    limit = int(page_size) + 1
+    rows = []
+    # two index-ordered queries rather than ORDER BY COALESCE(...), which sorts every row
+    if cursor is None or cursor[0] is not None:
+        bound = ["l.ts_epoch_ms IS NOT NULL"]
+        bound_params = []
+        if cursor is not None:
+            bound.append("(l.ts_epoch_ms, l.id) < (?, ?)")
+            bound_params = [int(cursor[0]), int(cursor[1])]
+        rows = _logs_page_query(where + bound, params + bound_params, "l.ts_epoch_ms DESC, l.id DESC", limit)
+    if len(rows) < limit:
+        bound = ["l.ts_epoch_ms IS NULL"]
+        bound_params = []
+        if cursor is not None and cursor[0] is None:
+            bound.append("l.id < ?")
+            bound_params = [int(cursor[1])]
+        rows += _logs_page_query(where + bound, params + bound_params, "l.id DESC", limit - len(rows))
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1][3], rows[-1][0])
+
+
+def _logs_page_query(where, params, order, limit):
+    sql = f"{LOGS_SELECT} WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+    return get_pool().reader().execute(sql, [*params, limit]).fetchall()
+
+
+def get_logs_page(cursor=None, page_size=LOG_PAGE_SIZE, habit_ids=None):
+    """DataFrame version of get_logs_page_rows: ``(df, next_cursor)``."""
+    import pandas as pd
+    rows, next_cursor = get_logs_page_rows(cursor, page_size, habit_ids)
+    return pd.DataFrame(rows, columns=LOGS_COLUMNS), next_cursor
+
+
+@cached_read
+def count_logs():
+    return get_pool().reader().execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+
+@cached_read
+def count_actions():
+    """Completions logged (SUM of logs.count), read from the daily rollup."""
+    return get_pool().reader().execute("SELECT COALESCE(SUM(count), 0) FROM daily_counts").fetchone()[0]
+
+
+EXPORT_CHUNK_SIZE = 5000
+LOG_CSV_HEADER = ('id', 'habit_id', 'habit_name', 'ts', 'note', 'count')
+
+
+def export_logs_csv(fp, chunk_size=EXPORT_CHUNK_SIZE, since=None, until=None, habit_ids=None):
+    """Write logs as CSV to the text file ``fp``, oldest first; returns the row count.
+
+    Rows go from the cursor to ``fp`` ``chunk_size`` at a time (the order is
+    served by idx_logs_epoch, no sort), so memory does not grow with the table.
+    """
+    where, params = _log_filters(since, until, habit_ids)
+    sql = "SELECT l.id, l.habit_id, h.name, l.ts, l.note, l.count FROM logs l LEFT JOIN habits h ON h.id = l.habit_id"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY l.ts_epoch_ms, l.id"
+    writer = csv.writer(fp, lineterminator='\n')
+    writer.writerow(LOG_CSV_HEADER)
+    cur = get_pool().reader().execute(sql, params)
+    total = 0
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return total
+            writer.writerows(rows)
+            total += len(rows)
+    finally:
+        cur.close()
+
+
+def export_logs_bytes(chunk_size=EXPORT_CHUNK_SIZE):
+    """The CSV export as UTF-8 bytes, spooled through a temp file.
+
+    Rows never pile up as DataFrames or str chunks, but the returned bytes are
+    a full O(N) copy of the CSV in memory; use export_logs_csv to stream."""
+    with tempfile.TemporaryFile() as raw:
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='') as fp:
+            export_logs_csv(fp, chunk_size)
+            fp.flush()
+            raw.seek(0)
+            return raw.read()
+
+
+# Columnar snapshot for offline analytics: <dest>/habits.<ext> plus
+# <dest>/logs/month=YYYY-MM/part-0.<ext> (hive-style, so readers can prune
+# partitions). pyarrow is optional and only imported here.
+SNAPSHOT_CHUNK_SIZE = 65536
+SNAPSHOT_FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'  # logs whose ts never parsed
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise ImportError("Parquet/Arrow export needs pyarrow: pip install pyarrow") from exc
+    return pa
+
+
+def _snapshot_writer(pa, path, schema, fmt, compression):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression=compression)
+    return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+
+def export_snapshot(dest, fmt='parquet', compression='zstd', chunk_size=SNAPSHOT_CHUNK_SIZE, overwrite=False,
+                    since=None, until=None, habit_ids=None):
+    """Write habits and logs as typed, compressed Parquet (or Arrow IPC) files under ``dest``.
+
+    Logs stream from the cursor in time order, one partition file open at a
+    time and one row group per chunk, so memory stays bounded. ``since``,
+    ``until`` and ``habit_ids`` filter the logs as in get_logs; ``habit_ids``
+    also limits the habits file. An existing snapshot in ``dest`` raises
+    FileExistsError unless ``overwrite`` is set.
+    Returns ``{'habits', 'logs', 'months', 'seconds'}``.
+    """
+    pa = _import_pyarrow()
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"unknown snapshot format: {fmt}")
+    # before touching dest, so a bad bound leaves an existing snapshot alone
+    where, params = _log_filters(since, until, habit_ids)
+    started = time.perf_counter()
+    ext = SNAPSHOT_FORMATS[fmt]
+    habits_path = os.path.join(dest, f'habits.{ext}')
+    logs_dir = os.path.join(dest, 'logs')
+    if os.path.exists(habits_path) or os.path.exists(logs_dir):
+        if not overwrite:
+            raise FileExistsError(f"snapshot already exists in {dest}")
+        shutil.rmtree(logs_dir, ignore_errors=True)
+        if os.path.exists(habits_path):
+            os.remove(habits_path)
+    os.makedirs(logs_dir)
+
+    conn = get_pool().reader()
+    ts_type = pa.timestamp('ms', tz='UTC')
+    habits_schema = pa.schema([('id', pa.int64()), ('name', pa.string()), ('category', pa.string()),
+                               ('target', pa.int64()), ('color', pa.string()), ('created_at', ts_type)])
+    habits_sql = "SELECT id, name, category, target, color, created_at FROM habits"
+    habit_params = []
+    if habit_ids is not None:
+        habit_params = [int(h) for h in habit_ids]
+        habits_sql += f" WHERE id IN ({','.join('?' * len(habit_params)) or 'NULL'})"
+    habits = conn.execute(habits_sql + " ORDER BY id", habit_params).fetchall()
+    columns = [list(c) for c in zip(*habits)] or [[] for _ in habits_schema]
+    columns[5] = [_ts_fields(v)[1] if v else None for v in columns[5]]
+    with _snapshot_writer(pa, habits_path, habits_schema, fmt, compression) as writer:
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(col, f.type) for col, f in zip(columns, habits_schema)], schema=habits_schema))
+
+    logs_schema = pa.schema([('id', pa.int64()), ('habit_id', pa.int64()), ('ts', ts_type),
+                             ('day', pa.date32()), ('note', pa.string()), ('ts_text', pa.string()),
+                             ('count', pa.int64())])
+    sql = ("SELECT strftime('%Y-%m', l.ts_epoch_ms / 1000.0, 'unixepoch'), l.id, l.habit_id, l.ts_epoch_ms,"
+           " l.day, l.note, l.ts, l.count FROM logs l")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cur = conn.execute(sql + " ORDER BY l.ts_epoch_ms, l.id", params)
+    writer, month, months, total = None, None, 0, 0
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            start = 0
+            # rows arrive in time order, so each month is one contiguous run
+            for end in range(1, len(rows) + 1):
+                if end < len(rows) and rows[end][0] == rows[start][0]:
+                    continue
+                if writer is None or rows[start][0] != month:
+                    if writer is not None:
+                        writer.close()
+                    month = rows[start][0]
+                    part_dir = os.path.join(logs_dir, f'month={month or NULL_PARTITION}')
+                    os.makedirs(part_dir)
+                    writer = _snapshot_writer(pa, os.path.join(part_dir, f'part-0.{ext}'), logs_schema, fmt, compression)
+                    months += 1
+                columns = list(zip(*rows[start:end]))[1:]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, f.type) for col, f in zip(columns, logs_schema)], schema=logs_schema))
+                total += end - start
+                start = end
+    finally:
+        cur.close()
+        if writer is not None:
+            writer.close()
+    return {'habits': len(habits), 'logs': total, 'months': months, 'seconds': time.perf_counter() - started}
+
+
+# Incremental export: rows whose mod_seq is past a cursor, as JSON Lines
+# ({"table": ..., "mod_seq": ..., <columns>}), habits before logs. Named
+# cursors live in sync_cursors and advance after every flushed chunk, so an
+# interrupted sync resumes where it stopped; a chunk may then be re-sent, so
+# consumers should upsert by (table, id). Deletes are not tracked (the app
+# never deletes habits or logs).
+SYNC_CHUNK_SIZE = 5000
+SYNC_COLUMNS = {
+    'habits': ('id', 'name', 'category', 'target', 'color', 'created_at'),
+    'logs': ('id', 'habit_id', 'ts', 'ts_epoch_ms', 'day', 'note', 'count'),
+}
+
+
+def get_sync_cursor(name):
+    """{'habits': seq, 'logs': seq} stored for cursor ``name`` (zeros if new)."""
+    row = get_pool().reader().execute(
+        "SELECT habits_seq, logs_seq FROM sync_cursors WHERE name=?", (name,)).fetchone()
+    return dict(zip(SYNC_COLUMNS, row or (0, 0)))
+
+
+def _save_sync_cursor(name, cursor):
+    with get_pool().writer() as conn:
+        conn.execute(
+            "INSERT INTO sync_cursors (name, habits_seq, logs_seq, updated_at) VALUES (?,?,?,?)"
+            " ON CONFLICT (name) DO UPDATE SET habits_seq = excluded.habits_seq,"
+            " logs_seq = excluded.logs_seq, updated_at = excluded.updated_at",
+            (name, cursor['habits'], cursor['logs'], datetime.utcnow().isoformat()),
+        )
+
+
+def export_changes(fp, name=None, since=None, chunk_size=SYNC_CHUNK_SIZE):
+    """Write habits and logs changed after a cursor to the text file ``fp``.
+
+    The starting point is ``since`` ({'habits': seq, 'logs': seq}) or, if
+    None, the stored cursor ``name``. With a ``name`` the cursor is saved
+    after each chunk. Changes committed while this runs wait for the next
+    call. Returns ``{'habits', 'logs', 'cursor'}``.
+    """
+    cursor = dict(since) if since is not None else get_sync_cursor(name) if name else dict.fromkeys(SYNC_COLUMNS, 0)
+    conn = get_pool().reader()
+    counts = {}
+    for table, columns in SYNC_COLUMNS.items():
+        # mod_seq only grows, so this bounds the run to what is committed now
+        upto = conn.execute(f"SELECT MAX(mod_seq) FROM {table}").fetchone()[0] or 0
+        sql = (f"SELECT mod_seq, {', '.join(columns)} FROM {table}"
+               " WHERE mod_seq > ? AND mod_seq <= ? ORDER BY mod_seq LIMIT ?")
+        counts[table] = 0
+        while True:
+            rows = conn.execute(sql, (cursor[table], upto, chunk_size)).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                fp.write(json.dumps({'table': table, 'mod_seq': row[0], **dict(zip(columns, row[1:]))},
+                                    ensure_ascii=False))
+                fp.write('\n')
+            fp.flush()
+            cursor[table] = rows[-1][0]
+            counts[table] += len(rows)
+            if name:
+                _save_sync_cursor(name, cursor)
+    return {**counts, 'cursor': cursor}
+
+
 # Analytics
 
-def weekly_counts(df_logs, days=28):
+@cached_read
+def get_daily_counts(since_day=None, habit_ids=None):
+    """Per-day totals from the daily_counts rollup as a Series indexed by day number."""
+    import pandas as pd
+    where, params = [], []
+    if since_day is not None:
+        where.append("day >= ?")
+        params.append(int(since_day))
+    if habit_ids is not None:
+        habit_ids = [int(h) for h in habit_ids]
+        where.append(f"habit_id IN ({','.join('?' * len(habit_ids)) or 'NULL'})")
+        params.extend(habit_ids)
+    sql = "SELECT day, SUM(count) FROM daily_counts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY day"
+    rows = get_pool().reader().execute(sql, params).fetchall()
+    return pd.Series(dict(rows), dtype=int)
+
+
+def weekly_counts(df_logs=None, days=28, habit_ids=None):
+    """Daily action counts for the last ``days`` days (UTC), oldest first.
+
+    Reads the daily_counts rollup, so the cost depends on ``days`` rather than
+    on the number of logs. Passing ``df_logs`` buckets that frame instead.
+    """
+    import pandas as pd
+    start = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=days)
+    rng = pd.date_range(start=start.normalize(), periods=days+1, freq='D')
+    if df_logs is None:
+        day_numbers = (rng - pd.Timestamp(0, tz='UTC')).days
+        counts = get_daily_counts(since_day=day_numbers[0], habit_ids=habit_ids)
+        if counts.empty:
+            return pd.Series(dtype=int)
+        return pd.Series(counts.reindex(day_numbers, fill_value=0).values, index=rng)
     if df_logs.empty:
         return pd.Series(dtype=int)
-    df = df_logs.copy()
-    df['ts'] = pd.to_datetime(df['ts'])
-    start = pd.Timestamp.utcnow() - pd.Timedelta(days=days)
-    rng = pd.date_range(start=start.normalize(), periods=days+1, freq='D')
-    s = df.set_index('ts').groupby(pd.Grouper(freq='D')).size().reindex(rng, fill_value=0)
-    s.index = s.index.normalize()
-    return s
+    days = (rng - pd.Timestamp(0, tz='UTC')).days
+    if 'count' in df_logs:
+        # a row stands for `count` actions; sum them per day like the rollup does
+        frame = df_logs.dropna(subset=['day']) if 'day' in df_logs else df_logs
+        counts = frame['count'].groupby(_log_days(frame)).sum()
+    else:
+        counts = pd.Series(_log_days(df_logs)).value_counts()
+    return pd.Series(counts.reindex(days, fill_value=0).values, index=rng)
+
+
+def streaks_from_days(days):
+    """(current, best) streak for ascending unique int day numbers.
+
+    Runs are split wherever consecutive days differ by more than one; the
+    current streak is the run that ends at the last logged day.
+    """
+    import numpy as np
+    days = np.asarray(days, dtype=np.int64)
+    if days.size == 0:
+        return 0, 0
+    bounds = np.flatnonzero(np.diff(days) != 1) + 1
+    lengths = np.diff(np.concatenate(([0], bounds, [days.size])))
+    return int(lengths[-1]), int(lengths.max())
+
+
+def streaks_by_group(habit_ids, days):
+    """Streaks for many habits at once from (habit_id, day) pairs sorted by both.
+
+    Pairs must be unique. A run starts wherever the habit changes or the day
+    does not follow the previous one; run lengths then reduce per habit with
+    one reduceat. Returns a DataFrame indexed by habit_id with current,
+    best and last_day columns.
+    """
+    import pandas as pd
+    ids, current, best, last_day = _group_runs(habit_ids, days)
+    return pd.DataFrame({'current': current, 'best': best, 'last_day': last_day},
+                        index=pd.Index(ids, name='habit_id'))
+
+
+def _group_runs(habit_ids, days):
+    # numpy core of streaks_by_group: (habit_ids, current, best, last_day) arrays
+    import numpy as np
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    if days.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    starts = np.ones(days.size, dtype=bool)
+    starts[1:] = (habit_ids[1:] != habit_ids[:-1]) | (np.diff(days) != 1)
+    first = np.flatnonzero(starts)
+    lengths = np.diff(np.append(first, days.size))
+    last_days = days[np.append(first[1:], days.size) - 1]
+    run_habits = habit_ids[first]
+    group = np.flatnonzero(np.r_[True, run_habits[1:] != run_habits[:-1]])
+    group_last = np.append(group[1:], run_habits.size) - 1
+    return run_habits[group], lengths[group_last], np.maximum.reduceat(lengths, group), last_days[group_last]
+
+
+def _log_days(df_logs):
+    # integer day column from the logs query; parse ts only for frames without it
+    import numpy as np
+    import pandas as pd
+    if 'day' in df_logs:
+        return df_logs['day'].dropna().to_numpy(dtype=np.int64)
+    ts = pd.to_datetime(df_logs['ts'], utc=True, format='ISO8601')
+    return ts.dt.tz_convert(None).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def calc_streaks_all(df_logs):
+    """Current and best streak for every habit in df_logs, indexed by habit_id."""
+    import numpy as np
+    import pandas as pd
+    if df_logs.empty:
+        return streaks_by_group([], [])[['current', 'best']]
+    if 'day' in df_logs:
+        pairs = df_logs[['habit_id', 'day']].dropna().astype(np.int64)
+    else:
+        pairs = pd.DataFrame({'habit_id': df_logs['habit_id'].to_numpy(), 'day': _log_days(df_logs)})
+    pairs = pairs.drop_duplicates().sort_values(['habit_id', 'day'])
+    return streaks_by_group(pairs['habit_id'], pairs['day'])[['current', 'best']]
 
 
 def calc_streaks(df_logs, habit_id=None):
+    import numpy as np
     if df_logs.empty:
         return 0,0
-    df = df_logs.copy()
-    df['ts'] = pd.to_datetime(df['ts']).dt.tz_localize(None)
+    df = df_logs
     if habit_id:
         df = df[df['habit_id']==habit_id]
-    days = sorted(set([d.date() for d in df['ts']]))
-    if not days:
-        return 0,0
-    streak=0; best=0; prev=None
-    for d in days:
-        if prev is None or d == prev + timedelta(days=1):
-            streak += 1
-        else:
-            streak = 1
-        prev = d
-        best = max(best, streak)
-    cur_streak = 0
-    dset = set(days)
-    d = max(days)
-    while d in dset:
-        cur_streak += 1
-        d = d - timedelta(days=1)
-    return cur_streak, best
-
-# --- Attempt to import Streamlit ---
-try:
-    import streamlit as st
-    STREAMLIT_IMPORTED = True
-except ModuleNotFoundError:
-    st = None
-    STREAMLIT_IMPORTED = False
+    return streaks_from_days(np.unique(_log_days(df)))
+
+
+@dataclass(frozen=True)
+class TargetAttainment:
+    """Daily counts measured against habits.target; one row per habit (by id).
+
+    ``ratio`` is count / target per day of the window (NaN before the habit's
+    first day), ``weekly`` the % of those days that met the target per week
+    (starting on ``weeks``, Mondays) and ``attainment`` the same over the
+    whole window. ``current``/``best`` are streaks of met days over all time.
+    """
+    habit_ids: object
+    names: list
+    targets: object
+    days: object
+    ratio: object
+    weeks: object
+    weekly: object
+    attainment: object
+    current: object
+    best: object
+
+
+@cached_read
+def get_target_rollup():
+    """(habits, daily) rows for target_attainment, both ordered by habit id.
+
+    habits are (id, name, target, created day) and daily the whole
+    daily_counts rollup as (habit_id, day, count).
+    """
+    conn = get_pool().reader()
+    habits = conn.execute(
+        "SELECT id, name, MAX(COALESCE(target, 1), 1),"
+        " CAST(julianday(created_at) - 2440587.5 AS INTEGER) FROM habits ORDER BY id"
+    ).fetchall()
+    daily = conn.execute("SELECT habit_id, day, count FROM daily_counts ORDER BY habit_id, day").fetchall()
+    return habits, daily
+
+
+def target_attainment(days=28):
+    """Target attainment for every habit over the last ``days`` days (UTC).
+
+    One pass over the daily rollup: counts are divided by each habit's target,
+    met days feed the streak run-lengths and the window is scattered into a
+    habits × days matrix that reduces to weekly percentages. A habit counts
+    from its creation (or first log, if earlier); today only counts once met.
+    """
+    import numpy as np
+    habits, daily = get_target_rollup()
+    today = int(time.time() * 1000) // MS_PER_DAY
+    day_numbers = np.arange(today - days, today + 1, dtype=np.int64)
+    ids = np.array([h[0] for h in habits], dtype=np.int64)
+    targets = np.array([h[2] for h in habits], dtype=np.int64)
+    rows = np.array(daily, dtype=np.int64).reshape(-1, 3)
+    rows = rows[np.isin(rows[:, 0], ids)]
+    pos = np.searchsorted(ids, rows[:, 0])
+    met = rows[:, 2] >= targets[pos]
+
+    # streaks of met days over the full history
+    current = np.zeros(ids.size, dtype=np.int64)
+    best = np.zeros(ids.size, dtype=np.int64)
+    met_ids, met_current, met_best, _ = _group_runs(rows[met, 0], rows[met, 1])
+    current[np.searchsorted(ids, met_ids)] = met_current
+    best[np.searchsorted(ids, met_ids)] = met_best
+
+    # habits × days ratio matrix for the window
+    start = np.array([h[3] if h[3] is not None else today for h in habits], dtype=np.int64)
+    np.minimum.at(start, pos, rows[:, 1])
+    ratio = np.where(day_numbers[None, :] >= start[:, None], 0.0, np.nan)
+    window = (rows[:, 1] >= day_numbers[0]) & (rows[:, 1] <= today)
+    ratio[pos[window], rows[window, 1] - day_numbers[0]] = rows[window, 2] / targets[pos[window]]
+    met_matrix = ratio >= 1
+    eligible = ~np.isnan(ratio)
+    eligible[:, -1] &= met_matrix[:, -1]
+
+    # day 0 (1970-01-01) was a Thursday, so (day + 3) // 7 numbers Monday-based weeks
+    weeks, week_of = np.unique((day_numbers + 3) // 7, return_inverse=True)
+    one_hot = (week_of[:, None] == np.arange(weeks.size)).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weekly = 100 * (met_matrix @ one_hot) / (eligible @ one_hot)
+        attainment = 100 * met_matrix.sum(axis=1) / eligible.sum(axis=1)
+    return TargetAttainment(
+        habit_ids=ids, names=[h[1] for h in habits], targets=targets, days=day_numbers,
+        ratio=ratio, weeks=weeks * 7 - 3, weekly=weekly, attainment=attainment,
+        current=current, best=best,
+    )
+
+# --- Charts ---
+
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class ChartCache:
+    """LRU of rendered chart images (bytes), bounded by total size.
+
+    Keys should include everything the image depends on - typically the
+    ReadCache data version, the window, the display timezone and the theme -
+    so a hit never needs to touch the database or matplotlib.
+    """
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, render):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        image = render()
+        with self._lock:
+            if key not in self._entries and len(image) <= self.max_bytes:
+                self._entries[key] = image
+                self.size += len(image)
+                while self.size > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.size -= len(old)
+        return image
+
+
+@_process_singleton
+def _open_chart_cache():
+    return ChartCache()
+
+
+def data_version():
+    """Token that changes whenever the database does (see ReadCache)."""
+    return get_pool().cache.version()
+
+
+def _theme_colors(theme):
+    if theme == 'light':
+        return {'bg': 'white', 'fg': '#31333f'}
+    return {'bg': '#0e1117', 'fg': '#e6eef6'}
+
+
+@contextmanager
+def chart_figure(figsize, nrows=1):
+    """Yield ``(fig, axes)`` on a standalone Agg canvas and clear it on exit.
+
+    Figures come from the object API rather than pyplot, so they never enter
+    pyplot's global figure registry (which keeps every figure alive until it
+    is closed) and can be drawn from several session threads at once.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(nrows, 1, squeeze=False)[:, 0]
+    try:
+        yield fig, axes
+    finally:
+        fig.clear()
+
+
+def _figure_png(fig, theme):
+    colors = _theme_colors(theme)
+    for ax in fig.axes:
+        ax.set_facecolor(colors['bg'])
+        ax.tick_params(colors=colors['fg'])
+        for spine in ax.spines.values():
+            spine.set_color(colors['fg'])
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, facecolor=colors['bg'])
+    return buf.getvalue()
+
+
+def render_activity_chart(s, theme='dark'):
+    """PNG bytes of the daily activity bar chart for a weekly_counts series."""
+    import matplotlib.dates as mdates
+    with chart_figure((8,2.2)) as (fig, (ax,)):
+        ax.bar(s.index, s.values)
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d %b'))
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_ha('right')
+        return _figure_png(fig, theme)
+
+
+WEEKDAY_LABELS = ['Seg', '', 'Qua', '', 'Sex', '', 'Dom']
+MONTH_LABELS = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+
+
+def heatmap_grid(values, first_day):
+    """Lay daily values out as a 7 x weeks grid (rows Monday..Sunday).
+
+    ``first_day`` is the day number of values[0]. Returns ``(grid, monday)``:
+    grid is float with NaN outside the range, monday the day number of
+    column 0. Placement is pure index arithmetic, no per-day Python loop.
+    """
+    import numpy as np
+    values = np.asarray(values, dtype=float)
+    monday = first_day - (first_day + 3) % 7  # 1970-01-01 was a Thursday
+    offsets = np.arange(values.size) + (first_day - monday)
+    grid = np.full((7, offsets[-1] // 7 + 1 if values.size else 0), np.nan)
+    grid[offsets % 7, offsets // 7] = values
+    return grid, monday
+
+
+def _heatmap_panels(s):
+    # one continuous grid for short ranges, GitHub-style calendar years otherwise
+    import numpy as np
+    import pandas as pd
+    days = (s.index - pd.Timestamp(0, tz='UTC')).days.to_numpy()
+    if days.size <= 62:
+        return [(None, *heatmap_grid(s.to_numpy(), days[0]))]
+    years = s.index.year.to_numpy()
+    panels = []
+    for year in np.unique(years):
+        jan1 = (pd.Timestamp(year, 1, 1, tz='UTC') - pd.Timestamp(0, tz='UTC')).days
+        dec31 = (pd.Timestamp(year, 12, 31, tz='UTC') - pd.Timestamp(0, tz='UTC')).days
+        full = np.full(dec31 - jan1 + 1, np.nan)
+        in_year = years == year
+        full[days[in_year] - jan1] = s.to_numpy()[in_year]
+        panels.append((int(year), *heatmap_grid(full, jan1)))
+    return panels
+
+
+def render_heatmap(s, theme='dark'):
+    """PNG bytes of a calendar heatmap (weeks x weekdays) for a weekly_counts series.
+
+    Ranges up to two months draw one grid; longer ranges draw one 53-week
+    row per calendar year. Each panel is a single imshow raster, so the cost
+    does not grow with a Python loop over days.
+    """
+    import numpy as np
+    import matplotlib
+    colors = _theme_colors(theme)
+    panels = _heatmap_panels(s)
+    vmax = max(float(np.nanmax(s.to_numpy())), 1.0)
+    cols = max(grid.shape[1] for _, grid, _ in panels)
+    with chart_figure((max(4.0, cols * 0.2 + 1), 1.7 * len(panels)), nrows=len(panels)) as (fig, axes):
+        cmap = matplotlib.colormaps['Blues'].copy()
+        cmap.set_bad(colors['bg'])
+        for ax, (year, grid, monday) in zip(axes, panels):
+            ax.imshow(np.ma.masked_invalid(grid), cmap=cmap, vmin=0, vmax=vmax, aspect='equal', interpolation='nearest')
+            ax.set_yticks(range(7))
+            ax.set_yticklabels(WEEKDAY_LABELS, fontsize=7)
+            # label the column holding the 1st of each month (by the week's Sunday)
+            week_months = (np.datetime64('1970-01-01') + monday + 6 + 7 * np.arange(grid.shape[1])).astype('datetime64[M]')
+            first_cols = np.flatnonzero(np.r_[True, week_months[1:] != week_months[:-1]])
+            if year is not None:
+                first_cols = first_cols[week_months[first_cols].astype('datetime64[Y]').astype(int) + 1970 == year]
+            ax.set_xticks(first_cols)
+            ax.set_xticklabels([MONTH_LABELS[m % 12] for m in week_months[first_cols].astype(int)], fontsize=7)
+            ax.tick_params(length=0)
+            if year is not None:
+                ax.set_title(str(year), fontsize=8, loc='left', color=colors['fg'])
+        return _figure_png(fig, theme)
+
+
+def cached_chart(kind, days, tz='UTC', theme='dark'):
+    """Rendered chart for the last ``days`` days, or None when there is no data.
+
+    Served from the ChartCache while the database, its data version, the
+    window (including the current UTC day), timezone and theme are unchanged.
+    """
+    window = (days, datetime.utcnow().date())
+    key = (kind, _resolve_db(), data_version(), window, tz, theme)
+    draw = render_activity_chart if kind == 'activity' else render_heatmap
+
+    def render():
+        s = weekly_counts(days=days)
+        return b'' if s.empty else draw(s, theme)
+
+    return _open_chart_cache().get(key, render) or None
+
 
 # --- Non-interactive environment detection ---
 IS_INTERACTIVE = sys.stdin.isatty() and sys.stdout.isatty()
@@ -145,49 +1895,78 @@ def run_fallback_if_needed():
 
     def print_header():
         print("B.L.I.N.K — Behavior Log (fallback mode)")
-        print("Streamlit is not installed in this environment.")
-        print("To run the full app with UI, install dependencies and run:")
-        print("  pip install -r requirements.txt")
-        print("  streamlit run blink_streamlit_app.py")
+        if importlib.util.find_spec('streamlit') is None:
+            print("Streamlit is not installed in this environment.")
+            print("To run the full app with UI, install dependencies and run:")
+            print("  pip install -r requirements.txt")
+        else:
+            print("To run the full app with UI, run:")
+        print("  streamlit run BLINK.py")
         print()
 
+    def print_log_rows(rows):
+        # ts, habit_name, count, note columns; plain text so the CLI never needs pandas
+        for r in rows:
+            print(f"  {r[2]:<26}  {r[6] or '-':<20}  {'×' + str(r[7]) if r[7] > 1 else '':<5}  {r[5] or ''}")
+
+    def pct(value):
+        return '-' if value != value else f"{value:.0f}%"
+
     def cli_summary():
-        dfh = get_habits()
-        dfl = get_logs()
+        habits = get_habit_rows()
+        recent, _ = get_logs_page_rows(page_size=5)
         print_header()
         print("Hábitos cadastrados:")
-        if dfh.empty:
+        if not habits:
             print("  (nenhum)")
         else:
-            for _, r in dfh.iterrows():
-                print(f"  {r['id']}: {r['name']} — {r['category'] or '-'} (meta {r['target']})")
+            for hid, name, category, target in habits:
+                print(f"  {hid}: {name} — {category or '-'} (meta {target})")
         print()
-        print(f"Total de registros: {len(dfl)}")
-        if not dfl.empty:
-            print(dfl[['ts','habit_name','note']].head(5).to_string(index=False))
+        print(f"Total de ações: {count_actions()} ({count_logs()} registros)")
+        print_log_rows(recent)
         print()
-        cur_streak, best = calc_streaks(dfl)
+        cur_streak, best = get_streak()
         print(f"Sequência atual (geral): {cur_streak}, melhor sequência: {best}")
         print()
+        att = target_attainment(28)
+        if att.habit_ids.size:
+            print("Metas (últimos 28 dias):")
+            for i, name in enumerate(att.names):
+                done_today = round(att.ratio[i, -1] * att.targets[i])
+                print(f"  {name}: hoje {done_today}/{att.targets[i]} · semana {pct(att.weekly[i, -1])}"
+                      f" · 28 dias {pct(att.attainment[i])} · sequência de metas {att.current[i]}"
+                      f" (melhor {att.best[i]})")
+            print()
         print("Note: interactive CLI disabled in this environment. To create habits or logs, run the app locally with Streamlit or deploy it where you can access the UI.")
 
     def interactive_cli_loop():
         # Only run this if the environment is interactive (TTYs available)
         def cli_list():
-            dfh = get_habits()
-            dfl = get_logs()
+            habits = get_habit_rows()
             print("Hábitos:")
-            if dfh.empty:
+            if not habits:
                 print("  (nenhum)")
             else:
-                for _, r in dfh.iterrows():
-                    print(f"  {r['id']}: {r['name']} — {r['category']} (meta {r['target']})")
+                for hid, name, category, target in habits:
+                    print(f"  {hid}: {name} — {category} (meta {target})")
             print()
-            print(f"Últimos registros ({len(dfl)}):")
-            if dfl.empty:
-                print("  (nenhum)")
-            else:
-                print(dfl[['ts','habit_name','note']].to_string(index=False))
+            print(f"Últimos registros ({count_logs()}):")
+            cursor = None
+            while True:
+                page, cursor = get_logs_page_rows(cursor)
+                if not page:
+                    print("  (nenhum)")
+                    break
+                print_log_rows(page)
+                if cursor is None:
+                    break
+                try:
+                    more = input('Enter para mais, q para parar: ').strip().lower()
+                except (OSError, EOFError):
+                    break
+                if more == 'q':
+                    break
 
         def cli_create_habit():
             name = input('Nome do hábito: ').strip()
@@ -204,19 +1983,24 @@ def run_fallback_if_needed():
             print('Hábito criado')
 
         def cli_log():
-            dfh = get_habits()
-            if dfh.empty:
+            habits = get_habit_rows()
+            if not habits:
                 print('Sem hábitos — crie um primeiro')
                 return
             print('Escolha o id do hábito para registrar:')
-            print(dfh[['id','name']].to_string(index=False))
+            for hid, name, _, _ in habits:
+                print(f"  {hid}: {name}")
             try:
                 hid = int(input('id: ').strip())
             except Exception:
                 print('id inválido')
                 return
             note = input('Observação (opcional): ').strip()
-            add_log(hid, datetime.utcnow().isoformat(), note)
+            try:
+                count = max(int(input('Quantidade [1]: ') or 1), 1)
+            except ValueError:
+                count = 1
+            add_log(hid, datetime.utcnow().isoformat(), note, count)
             print('Registrado')
 
         def cli_help():
@@ -254,12 +2038,198 @@ def run_fallback_if_needed():
     else:
         cli_summary()
 
-# Only run fallback when executing the script directly
-if __name__ == '__main__':
-    run_fallback_if_needed()
+# --- Command-line interface ---
+# `python BLINK.py <command> ...` for scripts, cron and pipelines. Every command
+# works on plain sqlite3 rows, so none of them imports pandas or matplotlib.
+# Without a command the fallback summary / prompt loop above runs as before.
+
+def _habit_exists(habit_id):
+    return get_pool().reader().execute("SELECT 1 FROM habits WHERE id=?", (habit_id,)).fetchone() is not None
+
+
+def cmd_new(args):
+    print(add_habit(args.name, args.category, args.target, args.color))
+    return 0
+
+
+def cmd_log(args):
+    if not _habit_exists(args.habit):
+        print(f"hábito desconhecido: {args.habit}", file=sys.stderr)
+        return 1
+    if args.ts is not None and _ts_fields(args.ts)[1] is None:
+        print(f"data/hora inválida: {args.ts}", file=sys.stderr)
+        return 1
+    if args.count < 1:
+        print(f"quantidade inválida: {args.count}", file=sys.stderr)
+        return 1
+    print(add_log(args.habit, args.ts, args.note, args.count, args.coalesce))
+    return 0
+
+
+def cmd_import(args):
+    source = sys.stdin if args.file == '-' else args.file
+    try:
+        report = import_logs(source, args.format, args.chunk_size, create_habits=not args.no_create_habits)
+    except (OSError, ValueError) as exc:
+        print(f"importação falhou: {exc}", file=sys.stderr)
+        return 1
+    print(f"{report['inserted']} registros importados, {report['skipped']} já existentes, "
+          f"em {report['seconds']:.2f}s ({report['rows_per_sec']:.0f}/s)", file=sys.stderr)
+    return 0
+
+
+def cmd_stats(args):
+    habits = get_habit_stats()
+    current, best = get_streak()
+    if args.json:
+        json.dump({
+            'habits': len(habits),
+            'logs': count_logs(),
+            'actions': count_actions(),
+            'streak': {'current': current, 'best': best},
+            'per_habit': [
+                {'id': hid, 'name': name, 'category': category, 'target': target,
+                 'total': total, 'current': cur, 'best': top}
+                for hid, name, category, target, total, cur, top in habits
+            ],
+        }, sys.stdout, ensure_ascii=False)
+        print()
+        return 0
+    print(f"Hábitos: {len(habits)}  Ações: {count_actions()}  Registros: {count_logs()}  "
+          f"Sequência atual: {current}  Melhor sequência: {best}")
+    for hid, name, category, target, total, cur, top in habits:
+        print(f"  {hid}: {name} — {category or '-'} (meta {target})  "
+              f"{total} ações · sequência {cur} (melhor {top})")
+    return 0
+
+
+def cmd_export(args):
+    for bound in (args.since, args.until):
+        if bound is not None and _ts_fields(bound)[1] is None:
+            print(f"data/hora inválida: {bound}", file=sys.stderr)
+            return 1
+    if args.format != 'csv':
+        if args.output in (None, '-'):
+            print("exportação em parquet/arrow precisa de --output DIRETÓRIO", file=sys.stderr)
+            return 1
+        try:
+            report = export_snapshot(args.output, args.format, args.compression,
+                                     args.chunk_size or SNAPSHOT_CHUNK_SIZE, args.overwrite,
+                                     args.since, args.until, args.habit)
+        except (ImportError, FileExistsError) as exc:
+            print(f"exportação falhou: {exc}", file=sys.stderr)
+            return 1
+        print(f"{report['habits']} hábitos e {report['logs']} registros ({report['months']} meses) "
+              f"exportados para {args.output} em {report['seconds']:.2f}s", file=sys.stderr)
+        return 0
+    fp = sys.stdout if args.output in (None, '-') else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        total = export_logs_csv(fp, args.chunk_size or EXPORT_CHUNK_SIZE, args.since, args.until, args.habit)
+    finally:
+        if fp is not sys.stdout:
+            fp.close()
+    if fp is not sys.stdout:
+        print(f"{total} registros exportados para {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_sync(args):
+    since = dict.fromkeys(SYNC_COLUMNS, 0) if args.reset else get_sync_cursor(args.name)
+    name = None if args.no_checkpoint else args.name
+    # append: chunks already in the file are ones the checkpointed cursor counts
+    # as delivered, so a rerun after an interruption must not truncate them
+    mode = 'w' if args.reset else 'a'
+    fp = sys.stdout if args.output in (None, '-') else open(args.output, mode, encoding='utf-8')
+    try:
+        report = export_changes(fp, name, since, args.chunk_size)
+    finally:
+        if fp is not sys.stdout:
+            fp.close()
+    if name:
+        # also records a --reset that found nothing to send
+        _save_sync_cursor(name, report['cursor'])
+    print(f"{report['habits']} hábitos e {report['logs']} registros alterados; cursor '{args.name}' em "
+          f"habits={report['cursor']['habits']} logs={report['cursor']['logs']}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='blink', description='B.L.I.N.K — registro de hábitos')
+    parser.add_argument('--db', help='arquivo do banco (padrão: $BLINK_DB_PATH ou blink_data.db)')
+    sub = parser.add_subparsers(dest='command', metavar='<comando>')
+
+    p = sub.add_parser('new', help='criar hábito e imprimir seu id')
+    p.add_argument('name')
+    p.add_argument('--category')
+    p.add_argument('--target', type=int, default=1)
+    p.add_argument('--color', default='#7c3aed')
+    p.set_defaults(func=cmd_new)
+
+    p = sub.add_parser('log', help='registrar atividade e imprimir o id do registro')
+    p.add_argument('--habit', type=int, required=True, help='id do hábito')
+    p.add_argument('--ts', help='data/hora ISO 8601 (padrão: agora, UTC)')
+    p.add_argument('--note')
+    p.add_argument('--count', type=int, default=1, help='quantidade (padrão: 1)')
+    p.add_argument('--coalesce', action='store_true', help='somar ao registro sem nota do mesmo dia')
+    p.set_defaults(func=cmd_log)
+
+    p = sub.add_parser('import', help='importar registros de CSV ou JSONL (hábito, ts, nota)')
+    p.add_argument('file', help="arquivo .csv ou .jsonl, ou '-' para stdin")
+    p.add_argument('--format', choices=('csv', 'jsonl'), help='padrão: pela extensão (csv)')
+    p.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    p.add_argument('--no-create-habits', action='store_true', help='recusar nomes de hábito desconhecidos')
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('stats', help='totais e sequências')
+    p.add_argument('--json', action='store_true', help='saída em JSON')
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('export', help='exportar registros em CSV')
+    p.add_argument('--format', choices=('csv', *SNAPSHOT_FORMATS), default='csv',
+                   help='csv (padrão) ou snapshot colunar de hábitos e registros, particionado por mês')
+    p.add_argument('-o', '--output', help="arquivo de saída (padrão: stdout); diretório para parquet/arrow")
+    p.add_argument('--compression', default='zstd', help='compressão do parquet/arrow (padrão: zstd)')
+    p.add_argument('--overwrite', action='store_true', help='substituir um snapshot existente')
+    p.add_argument('--chunk-size', type=int,
+                   help=f'linhas por leitura (padrão: {EXPORT_CHUNK_SIZE} no csv, {SNAPSHOT_CHUNK_SIZE} no parquet/arrow)')
+    p.add_argument('--since', help='a partir de (ISO 8601)')
+    p.add_argument('--until', help='antes de (ISO 8601)')
+    p.add_argument('--habit', type=int, action='append', help='id do hábito (repetível)')
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('sync', help='exportar em JSONL só o que mudou desde o último sync com este nome')
+    p.add_argument('name', help='nome do cursor (ex.: warehouse)')
+    p.add_argument('-o', '--output', help='arquivo de saída, sempre acrescentado (padrão: stdout)')
+    p.add_argument('--chunk-size', type=int, default=SYNC_CHUNK_SIZE)
+    p.add_argument('--reset', action='store_true', help='recomeçar do início (sobrescreve --output)')
+    p.add_argument('--no-checkpoint', action='store_true', help='não avançar o cursor salvo')
+    p.set_defaults(func=cmd_sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        with use_database(args.db) if args.db else nullcontext():
+            if args.command is None:
+                run_fallback_if_needed()
+                return 0
+            return args.func(args)
+    except BrokenPipeError:
+        # reader went away (e.g. `blink export | head`); silence the flush at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+# Only run the CLI when executing the script directly (`streamlit run` also
+# executes it as __main__, but then the UI below takes over)
+if __name__ == '__main__' and not STREAMLIT_IMPORTED:
+    sys.exit(main())
 
 # ---- Streamlit UI: only run if Streamlit is imported successfully ----
 if STREAMLIT_IMPORTED:
+    import numpy as np
+    import pandas as pd
+
     # Page config
     st.set_page_config(page_title="B.L.I.N.K — Behavior Log", layout="wide", initial_sidebar_state="expanded")
 
@@ -302,16 +2272,16 @@ if STREAMLIT_IMPORTED:
     # Sidebar controls
     with st.sidebar:
         st.header("Controles")
-        if st.button("Exportar CSV"):
-            df_logs = get_logs()
-            csv = df_logs.to_csv(index=False).encode('utf-8')
-            b64 = base64.b64encode(csv).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="blink_logs.csv">Baixar logs</a>'
-            st.markdown(href, unsafe_allow_html=True)
+        # the callable runs only when clicked, on its own thread (Streamlit 1.52+)
+        st.download_button("Exportar CSV", data=export_logs_bytes,
+                           file_name="blink_logs.csv", mime="text/csv", on_click="ignore")
 
         st.markdown("---")
         st.markdown("**Configurações**")
         tz = st.selectbox("Fuso horário (exibição)",["UTC","Local (sistema)"])
+        coalesce = st.checkbox("Agrupar registros do mesmo dia", value=False,
+                               help="+1 e registros sem observação somam na linha de hoje em vez de criar outra")
+        theme = st.get_option("theme.base") or "dark"
         st.markdown("---")
         st.markdown("**Inspiração**")
         if st.button("Gerar citação motivacional"):
@@ -351,75 +2321,98 @@ if STREAMLIT_IMPORTED:
             with st.form("log_form"):
                 h_opt = {row['name']: row['id'] for _, row in df_h.iterrows()}
                 habit_sel = st.selectbox("Escolha hábito", options=list(h_opt.keys()))
+                qty = st.number_input("Quantidade", min_value=1, max_value=1000, value=1)
                 note = st.text_input("Observação (opcional)")
                 if st.form_submit_button("Registrar agora"):
-                    add_log(h_opt[habit_sel], datetime.utcnow().isoformat(), note)
-                    st.success("Registrado ✅")
+                    add_log(h_opt[habit_sel], datetime.utcnow().isoformat(), note, int(qty), coalesce)
+                    st.success(f"Registrado ✅ (+{int(qty)})")
 
         st.markdown("---")
         st.subheader("Lista de hábitos")
+        streaks = get_habit_streaks()
         for _, r in df_h.iterrows():
+            cur, best = streaks.loc[r['id']] if r['id'] in streaks.index else (0, 0)
             with st.container():
                 c1, c2 = st.columns([6,1])
-                c1.markdown(f"**{r['name']}**  <span class=\"small\">{r['category'] or ''}</span>", unsafe_allow_html=True)
+                c1.markdown(f"**{r['name']}**  <span class=\"small\">{r['category'] or ''} · sequência {cur} (melhor {best})</span>", unsafe_allow_html=True)
                 if c2.button("+1", key=f"quick_{r['id']}"):
-                    add_log(r['id'])
-                    st.experimental_rerun()
+                    # the summary column renders after this one, so no rerun is needed
+                    add_log(r['id'], coalesce=coalesce)
+                    st.toast(f"{r['name']}: +1 registrado ✅")
 
     with col_right:
         st.subheader("Painel — Resumo")
-        df_logs = get_logs()
         df_h = get_habits()
 
-        total_actions = len(df_logs)
+        total_actions = count_actions()
         unique_habits = len(df_h)
-        cur_streak, best_streak = calc_streaks(df_logs)
+        cur_streak, best_streak = get_streak()
 
         kcol1, kcol2, kcol3 = st.columns(3)
         kcol1.metric("Ações totais", total_actions)
         kcol2.metric("Hábitos ativos", unique_habits)
         kcol3.metric("Sequência atual", cur_streak)
 
+        st.markdown("---")
+        st.markdown("**Metas — últimos 28 dias**")
+        att = target_attainment(28)
+        if att.habit_ids.size == 0:
+            st.info("Crie um hábito para acompanhar as metas")
+        else:
+            done_today = np.rint(att.ratio[:, -1] * att.targets).astype(int)
+            goals = pd.DataFrame({
+                'Hábito': att.names,
+                'Hoje': [f"{d}/{t}" for d, t in zip(done_today, att.targets)],
+                '28 dias': att.attainment,
+                'Sequência de metas': att.current,
+                'Melhor': att.best,
+            })
+            week_cols = [f"Sem. {d:%d/%m}" for d in pd.to_datetime(att.weeks, unit='D')]
+            goals[week_cols] = att.weekly
+            pct = st.column_config.NumberColumn(format="%.0f%%")
+            st.dataframe(goals, hide_index=True, column_config={c: pct for c in ['28 dias', *week_cols]})
+
         st.markdown("---")
         st.markdown("**Atividade últimos 28 dias**")
-        s = weekly_counts(df_logs, days=28)
-        fig, ax = plt.subplots(figsize=(8,2.2))
-        ax.bar(s.index, s.values)
-        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d %b'))
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        st.pyplot(fig)
+        png = cached_chart('activity', 28, tz, theme)
+        if png is None:
+            st.info("Sem registros nos últimos 28 dias")
+        else:
+            st.image(png)
 
         st.markdown("---")
         st.subheader("Detalhes dos logs")
-        if df_logs.empty:
+        page_size = st.selectbox("Registros por página", [25, 50, 100, 200], index=1)
+        # stack of cursors for the pages visited so far; reset when the size changes
+        if st.session_state.get('log_page_size') != page_size:
+            st.session_state['log_page_size'] = page_size
+            st.session_state['log_cursors'] = [None]
+        cursors = st.session_state['log_cursors']
+        page, next_cursor = get_logs_page(cursors[-1], page_size=page_size)
+        if page.empty:
             st.info("Sem registros ainda")
         else:
-            st.dataframe(df_logs[['ts','habit_name','note']].assign(ts=lambda d: pd.to_datetime(d['ts']).dt.tz_localize(None)))
+            st.dataframe(page[['ts','habit_name','count','note']].assign(ts=pd.to_datetime(page['ts_epoch_ms'], unit='ms')))
+            pcol1, pcol2, pcol3 = st.columns([1,2,1])
+            if pcol1.button("◀ Anterior", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+            pcol2.markdown(f'<p class="small">Página {len(cursors)}</p>', unsafe_allow_html=True)
+            if pcol3.button("Próxima ▶", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
 
     # bottom: calendar heatmap (simple)
     st.markdown("---")
-    st.subheader("Mapa de calor: últimos 30 dias")
+    heat_windows = {"30 dias": 30, "1 ano": 365, "2 anos": 730}
+    heat_label = st.radio("Período do mapa de calor", list(heat_windows), horizontal=True)
+    st.subheader(f"Mapa de calor: últimos {heat_label}")
 
-    s30 = weekly_counts(df_logs, days=30)
-    if s30.empty:
+    png = cached_chart('heatmap', heat_windows[heat_label], tz, theme)
+    if png is None:
         st.info("Sem dados suficientes")
     else:
-        fig2, ax2 = plt.subplots(figsize=(10,2.6))
-        dates = s30.index
-        vals = s30.values
-        # Normalize for color intensity
-        norm = (vals - vals.min()) / (vals.max() - vals.min() + 1e-6)
-        for i, d in enumerate(dates):
-            ax2.add_patch(plt.Rectangle((i,0),1,1, color=(0.2,0.6,0.9,norm[i]*0.9+0.06)))
-        ax2.set_xlim(0,len(dates))
-        ax2.set_ylim(0,1)
-        ax2.set_yticks([])
-        ax2.set_xticks(range(len(dates)))
-        ax2.set_xticklabels([d.strftime('%d %b') for d in dates], rotation=45, ha='right')
-        plt.tight_layout()
-        st.pyplot(fig2)
+        st.image(png)
 
     st.markdown("---")
     with st.container():
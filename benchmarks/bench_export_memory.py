@@ -0,0 +1,92 @@
+# Peak memory of the CSV export: old DataFrame + base64 data URL vs export_logs_bytes/_csv.
+#
+#   python benchmarks/bench_export_memory.py [--sizes 100000 1000000]
+#
+# Each export runs in a fresh process so ru_maxrss is that export's own peak.
+# "before" is the old sidebar button (get_logs() -> to_csv -> base64 -> link);
+# "stream" writes export_logs_csv into a file; its peak should stay flat as the
+# table grows (SQLite's page cache, cache_size_kib, is capped). "bytes" is
+# export_logs_bytes, what the download button serves: it still holds the whole
+# CSV once, so it grows with the table, but without the DataFrame and base64.
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import BLINK  # noqa: E402
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def legacy_export():
+    import base64
+    import pandas as pd  # noqa: F401  (loaded by get_logs either way)
+    csv = BLINK.get_logs().to_csv(index=False).encode('utf-8')
+    b64 = base64.b64encode(csv).decode()
+    return f'<a href="data:file/csv;base64,{b64}" download="blink_logs.csv">Baixar logs</a>'
+
+
+def child(mode, path):
+    # pandas is imported up front in both modes so the baseline is comparable
+    import pandas  # noqa: F401
+    # mmap'd database pages are file-backed but still count towards RSS (up to
+    # mmap_size); turn mmap off so the numbers show the export's own memory
+    BLINK.DB_SETTINGS = BLINK.DBSettings(mmap_size=0)
+    with BLINK.use_database(path):
+        base = peak_rss_mb()
+        started = time.perf_counter()
+        if mode == "before":
+            legacy_export()
+        elif mode == "bytes":
+            BLINK.export_logs_bytes()
+        else:
+            with open(os.devnull, "w", newline="", encoding="utf-8") as fp:
+                BLINK.export_logs_csv(fp)
+        print(f"{peak_rss_mb() - base:.1f} {time.perf_counter() - started:.2f}")
+
+
+def seed(path, rows):
+    conn = BLINK.init_db(BLINK.get_conn(path))
+    conn.execute("INSERT INTO habits (name, target, created_at) VALUES ('bench', 1, ?)", (datetime.utcnow().isoformat(),))
+    start = datetime.utcnow() - timedelta(days=365)
+    with conn:
+        conn.executemany(BLINK.INSERT_LOG_SQL,
+                         (BLINK._log_row(1, start + timedelta(seconds=30 * i), f"note {i}") for i in range(rows)))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    modes = ("before", "bytes", "stream")
+    print(f"{'logs':>10}" + "".join(f" {m + ' MB':>10} {m + ' s':>9}" for m in modes))
+    workdir = tempfile.mkdtemp(prefix="blink_bench_")
+    for n in args.sizes:
+        path = os.path.join(workdir, f"export_{n}.db")
+        seed(path, n)
+        results = []
+        for mode in modes:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, path],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            results += [float(out[0]), float(out[1])]
+        print(f"{n:>10}" + "".join(f" {mb:>10.1f} {s:>9.2f}" for mb, s in zip(results[::2], results[1::2])))
+
+
+if __name__ == "__main__":
+    main()
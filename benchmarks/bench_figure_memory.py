@@ -0,0 +1,66 @@
+# RSS regression check for chart rendering across many dashboard reruns.
+#
+#   python benchmarks/bench_figure_memory.py [--reruns 1000] [--max-growth-mb 25]
+#
+# Each "rerun" renders the activity chart and the 30-day heatmap from scratch
+# (bypassing the chart cache), as a cache miss would. After a warm-up, resident
+# memory must stay within --max-growth-mb; the script exits non-zero otherwise.
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import BLINK  # noqa: E402
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # peak rather than current RSS, still catches unbounded growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def rerun():
+    BLINK.render_activity_chart(BLINK.weekly_counts(days=28))
+    BLINK.render_heatmap(BLINK.weekly_counts(days=30))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--max-growth-mb", type=float, default=25.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="blink_bench_")
+    with BLINK.use_database(os.path.join(workdir, "bench.db")):
+        BLINK.add_habit("bench", None, 1, "#7c3aed")
+        now = datetime.utcnow()
+        BLINK.add_logs_bulk((1, now - timedelta(hours=7 * i), None) for i in range(200))
+
+        for _ in range(args.warmup):
+            rerun()
+        gc.collect()
+        baseline = rss_mb()
+        for i in range(1, args.reruns + 1):
+            rerun()
+            if i % 250 == 0:
+                print(f"{i:>6} reruns  rss {rss_mb():8.1f} MB")
+        gc.collect()
+        growth = rss_mb() - baseline
+        print(f"baseline {baseline:.1f} MB, growth {growth:+.1f} MB over {args.reruns} reruns")
+        if growth > args.max_growth_mb:
+            sys.exit(f"FAIL: RSS grew {growth:.1f} MB (limit {args.max_growth_mb} MB)")
+
+
+if __name__ == "__main__":
+    main()
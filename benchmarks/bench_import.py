@@ -0,0 +1,58 @@
+# import_logs throughput: a fresh import and a re-import of the same file.
+#
+#   python benchmarks/bench_import.py [--rows 1000000] [--format csv|jsonl]
+#
+# The file mimics another tracker's export: habits by name, ISO timestamps
+# (newest first) and an occasional note. The re-import must skip every row.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import BLINK  # noqa: E402
+
+HABITS = ["Ler", "Correr", "Meditar", "Água", "Dormir cedo"]
+
+
+def write_source(path, rows, fmt, seed=0):
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            f.write("Habit,Timestamp,Note\n")
+        for i in range(rows):
+            habit = rng.choice(HABITS)
+            ts = (now - timedelta(seconds=97 * i)).isoformat(timespec="seconds")
+            note = "ok" if i % 3 == 0 else ""
+            if fmt == "csv":
+                f.write(f"{habit},{ts},{note}\n")
+            else:
+                f.write(json.dumps({"habit": habit, "timestamp": ts, "note": note or None}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=BLINK.IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="blink_bench_")
+    with BLINK.use_database(os.path.join(workdir, "bench.db")):
+        path = os.path.join(workdir, f"source.{args.format}")
+        write_source(path, args.rows, args.format)
+        print(f"{'run':<10} {'inserted':>10} {'skipped':>10} {'seconds':>8} {'rows/s':>10}")
+        for label in ("fresh", "re-import"):
+            r = BLINK.import_logs(path, chunk_size=args.chunk_size)
+            print(f"{label:<10} {r['inserted']:>10} {r['skipped']:>10} {r['seconds']:>8.2f} {r['rows_per_sec']:>10.0f}")
+        assert BLINK.count_logs() == args.rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Import-time regression gate for the CLI / fallback path.
+#
+#   python benchmarks/bench_import_time.py [--max-import-ms 150] [--runs 5]
+#
+# Runs `python -X importtime -c "import BLINK"` and fails (non-zero exit) if the
+# module pulls in pandas, numpy, matplotlib or streamlit, or if its cumulative
+# import time exceeds the budget. Also reports the wall time of the
+# non-interactive fallback summary against an already-migrated database.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+HEAVY = ("pandas", "numpy", "matplotlib", "streamlit")
+
+
+def import_profile(env):
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import BLINK"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                          capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-import-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db = os.path.join(tempfile.mkdtemp(prefix="blink_bench_"), "blink_data.db")
+    env = dict(os.environ, BLINK_DB_PATH=db)
+    # create and migrate the database up front so the fallback run only reads it
+    subprocess.run([sys.executable, os.path.join(ROOT, "BLINK.py"), "stats"], env=env,
+                   stdout=subprocess.DEVNULL, check=True)
+
+    best = None
+    for _ in range(args.runs):
+        modules = import_profile(env)
+        heavy = sorted({m.split(".")[0] for m in modules} & set(HEAVY))
+        if heavy:
+            sys.exit(f"FAIL: importing BLINK loaded {', '.join(heavy)}")
+        us = modules["BLINK"]
+        best = us if best is None else min(best, us)
+
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "BLINK.py")], env=env,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+    fallback_ms = (time.perf_counter() - started) * 1000
+
+    print(f"import BLINK: {best / 1000:.1f} ms (best of {args.runs}, budget {args.max_import_ms:.0f} ms)")
+    print(f"fallback summary (whole process): {fallback_ms:.0f} ms")
+    if best / 1000 > args.max_import_ms:
+        sys.exit(f"FAIL: import took {best / 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Concurrent read/write throughput: default rollback journal vs tuned get_conn.
+#
+#   python benchmarks/bench_sqlite_concurrency.py [--seconds 5] [--readers 4] [--writers 4]
+#
+# Each worker thread owns its own connection (like separate Streamlit sessions).
+# Writers do the same INSERT + commit as a "+1" click; readers run the dashboard
+# window query. Reports ops/s and how many operations failed with
+# "database is locked".
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import BLINK  # noqa: E402
+
+# the original get_conn: sqlite3.connect defaults (rollback journal, FULL sync,
+# Python's 5 s busy timeout) and SQLite's default page cache, no mmap
+LEGACY = BLINK.DBSettings(journal_mode="delete", synchronous="FULL", busy_timeout_ms=5000,
+                          cache_size_kib=2000, mmap_size=0)
+
+
+def seed(path, settings, rows):
+    conn = BLINK.init_db(BLINK.get_conn(path, settings))
+    conn.execute("INSERT INTO habits (name, target, created_at) VALUES ('bench', 1, ?)", (datetime.utcnow().isoformat(),))
+    start = datetime.utcnow() - timedelta(days=365)
+    with conn:
+        conn.executemany(BLINK.INSERT_LOG_SQL,
+                         (BLINK._log_row(1, start + timedelta(minutes=5 * i), None) for i in range(rows)))
+    conn.close()
+
+
+def run(path, settings, seconds, readers, writers):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    since = BLINK._ts_fields(datetime.utcnow() - timedelta(days=30))[1]
+
+    def worker(write):
+        conn = BLINK.get_conn(path, settings)
+        if write:
+            # same durability as the app's ConnectionPool writer
+            conn.execute(f"PRAGMA synchronous={settings.write_synchronous}")
+        done = locked = 0
+        while not stop.is_set():
+            try:
+                if write:
+                    conn.execute(BLINK.INSERT_LOG_SQL, BLINK._log_row(1, datetime.utcnow(), None))
+                    conn.commit()
+                else:
+                    conn.execute("SELECT COUNT(*) FROM logs WHERE ts_epoch_ms >= ?", (since,)).fetchone()
+                done += 1
+            except sqlite3.OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                if conn.in_transaction:
+                    conn.rollback()
+                locked += 1
+        conn.close()
+        with lock:
+            counts["writes" if write else "reads"] += done
+            counts["locked"] += locked
+
+    threads = [threading.Thread(target=worker, args=(False,)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=(True,)) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {k: v / seconds if k != "locked" else v for k, v in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'settings':<10} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    workdir = tempfile.mkdtemp(prefix="blink_bench_")
+    for label, settings in (("before", LEGACY), ("after", BLINK.DB_SETTINGS)):
+        path = os.path.join(workdir, f"bench_{label}.db")
+        seed(path, settings, args.rows)
+        r = run(path, settings, args.seconds, args.readers, args.writers)
+        print(f"{label:<10} {r['reads']:>10.0f} {r['writes']:>10.0f} {r['locked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
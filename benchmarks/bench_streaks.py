@@ -0,0 +1,108 @@
+# calc_streaks: original set/timedelta walk vs the NumPy run-length engine.
+#
+#   python benchmarks/bench_streaks.py [--sizes 10000 1000000 10000000] [--db-rows 200000]
+#
+# Logs are spread over ~3 years with random gaps so both long and broken
+# streaks occur. ``ts`` is passed as datetime64 so the timings measure the
+# streak computation rather than ISO string parsing (the same for both).
+#
+# The per-habit run stores --db-rows logs in a temp database and times
+# calc_streaks_all(get_logs()) against the legacy walk once per habit; both
+# must match the materialized habit_streaks table (get_habit_streaks).
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import BLINK  # noqa: E402
+
+
+def legacy_calc_streaks(df_logs, habit_id=None):
+    # calc_streaks as it was before the NumPy rewrite
+    if df_logs.empty:
+        return 0,0
+    df = df_logs.copy()
+    df['ts'] = pd.to_datetime(df['ts']).dt.tz_localize(None)
+    if habit_id:
+        df = df[df['habit_id']==habit_id]
+    days = sorted(set([d.date() for d in df['ts']]))
+    if not days:
+        return 0,0
+    streak=0; best=0; prev=None
+    for d in days:
+        if prev is None or d == prev + timedelta(days=1):
+            streak += 1
+        else:
+            streak = 1
+        prev = d
+        best = max(best, streak)
+    cur_streak = 0
+    dset = set(days)
+    d = max(days)
+    while d in dset:
+        cur_streak += 1
+        d = d - timedelta(days=1)
+    return cur_streak, best
+
+
+def make_logs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    span_days = 3 * 365
+    active = rng.random(span_days) < 0.8  # ~20% of days have no logs
+    days = rng.choice(np.flatnonzero(active), size=n)
+    ms = days.astype(np.int64) * 86_400_000 + rng.integers(0, 86_400_000, size=n)
+    ts = pd.to_datetime(ms + 1_600_000_000_000, unit="ms")
+    return pd.DataFrame({"habit_id": rng.integers(1, 6, size=n), "ts": ts})
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def per_habit(n):
+    df = make_logs(n, seed=1)
+    workdir = tempfile.mkdtemp(prefix="blink_bench_")
+    with BLINK.use_database(os.path.join(workdir, "bench.db")):
+        for h in range(1, 6):
+            BLINK.add_habit(f"habit {h}", None, 1, "#7c3aed")
+        BLINK.add_logs_bulk(zip(df["habit_id"].tolist(), df["ts"].dt.to_pydatetime(), [None] * n))
+        logs = BLINK.get_logs()
+        stored = BLINK.get_habit_streaks()
+    new, t_new = timed(BLINK.calc_streaks_all, logs)
+    parsed = logs.assign(ts=pd.to_datetime(logs["ts"], format="ISO8601"))  # as above, parsing is not timed
+    old, t_old = timed(lambda: {h: legacy_calc_streaks(parsed, h) for h in sorted(logs["habit_id"].unique())})
+    old = pd.DataFrame.from_dict(old, orient="index", columns=["current", "best"]).rename_axis("habit_id")
+    pd.testing.assert_frame_equal(new, stored, check_dtype=False)
+    pd.testing.assert_frame_equal(old, stored, check_dtype=False)
+    print(f"\nper habit, {n} stored logs: legacy loop {t_old:.3f} s, calc_streaks_all {t_new:.3f} s"
+          f" ({t_old / t_new:.1f}x), both match get_habit_streaks()")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--db-rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'logs':>10} {'legacy s':>10} {'numpy s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        df = make_logs(n)
+        old, t_old = timed(legacy_calc_streaks, df)
+        new, t_new = timed(BLINK.calc_streaks, df)
+        assert old == new, (n, old, new)
+        print(f"{n:>10} {t_old:>10.3f} {t_new:>10.3f} {t_old / t_new:>7.1f}x")
+    per_habit(args.db_rows)
+
+
+if __name__ == "__main__":
+    main()